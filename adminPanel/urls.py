@@ -11,4 +11,5 @@ urlpatterns = [
     path('messages/', views.message_management, name='messages'),
     path('messages/<int:message_id>/read/', views.mark_message_read, name='mark_message_read'),
     path('messages/<int:message_id>/delete/', views.delete_message, name='delete_message'),
+    path('stripe-latency/', views.stripe_latency, name='stripe_latency'),
 ]
\ No newline at end of file
@@ -1,13 +1,16 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.db.models import Count, Sum, Q
+from django.db.models import Count, Q
 from django.utils import timezone
 from datetime import timedelta
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from authentication import throttling
 from authentication.models import CustomUser
 from campaigns.models import Campaign, CampaignApplication, CustomOffer
-from payments.models import Payment, Subscription
+from payments.models import Subscription
+from payments import ledger as revenue_ledger, stripe_client
+from crewup import badges as badge_service
 from .models import ContactMessage
 
 def dashboard_view(request):
@@ -30,10 +33,10 @@ def dashboard_view(request):
     # Get recent users (last 5)
     recent_users = CustomUser.objects.order_by('-date_joined')[:5]
 
-    # Get total revenue from completed payments
-    total_revenue = Payment.objects.filter(status='completed').aggregate(
-        total=Sum('amount')
-    )['total'] or 0
+    # Revenue, MRR and churn come from the precomputed monthly ledger totals
+    total_revenue = revenue_ledger.total_revenue()
+    revenue_months = revenue_ledger.monthly_report(months=6)
+    current_revenue = revenue_months[-1] if revenue_months else None
 
     # Get active subscriptions count
     active_subscriptions = Subscription.objects.filter(status='active').count()
@@ -47,6 +50,9 @@ def dashboard_view(request):
     # Get unread messages count
     unread_messages = ContactMessage.objects.filter(is_read=False).count()
 
+    # Failed, blocked and locked-out logins since the throttle cache was last cleared
+    login_throttle = throttling.metrics()
+
     context = {
         'total_users': total_users,
         'active_campaigns': active_campaigns,
@@ -55,10 +61,13 @@ def dashboard_view(request):
         'recent_campaigns': recent_campaigns,
         'recent_users': recent_users,
         'total_revenue': total_revenue,
+        'revenue_months': list(reversed(revenue_months)),
+        'current_revenue': current_revenue,
         'active_subscriptions': active_subscriptions,
         'pending_applications': pending_applications,
         'total_offers': total_offers,
         'unread_messages': unread_messages,
+        'login_throttle': login_throttle,
     }
 
     return render(request, 'admin/dashboard.html', context)
@@ -241,8 +250,8 @@ def mark_message_read(request, message_id):
         return redirect('admin_dashboard')
 
     message = get_object_or_404(ContactMessage, id=message_id)
-    message.is_read = True
-    message.save()
+    if ContactMessage.objects.filter(id=message.id, is_read=False).update(is_read=True):
+        badge_service.adjust(badge_service.UNREAD_MESSAGES, -1)
 
     messages.success(request, 'Message marked as read.')
     return redirect('adminPanel:messages')
@@ -256,6 +265,31 @@ def delete_message(request, message_id):
 
     message = get_object_or_404(ContactMessage, id=message_id)
     message.delete()
+    if not message.is_read:
+        badge_service.adjust(badge_service.UNREAD_MESSAGES, -1)
 
     messages.success(request, 'Message deleted successfully.')
-    return redirect('adminPanel:messages')
\ No newline at end of file
+    return redirect('adminPanel:messages')
+
+@login_required
+def stripe_latency(request):
+    """Per-endpoint latency histograms for outgoing Stripe API calls"""
+    if request.user.user_type != 'admin':
+        messages.error(request, 'Access denied.')
+        return redirect('admin_dashboard')
+
+    if request.method == 'POST':
+        stripe_client.reset_latency()
+        messages.success(request, 'Stripe latency statistics reset.')
+        return redirect('adminPanel:stripe_latency')
+
+    bounds = stripe_client.LATENCY_BUCKETS_MS
+    bucket_labels = [f'≤{bound} ms' for bound in bounds] + [f'>{bounds[-1]} ms']
+
+    context = {
+        'endpoints': stripe_client.latency_report(),
+        'bucket_labels': bucket_labels,
+        'slowest_bound': bounds[-1],
+    }
+
+    return render(request, 'admin/stripe_latency.html', context)
@@ -6,3 +6,7 @@ class AuthConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'authentication'
 
+    def ready(self):
+        # Registers the cached-user invalidation receivers and the login throttle cache check
+        from . import checks, signals
+
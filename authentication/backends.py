@@ -1,18 +1,68 @@
+from django.conf import settings
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.core.cache import cache
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Lower
+from django.db.models.lookups import Exact
+
+# Logged-in users are re-read from the database at least this often (seconds)
+USER_CACHE_TIMEOUT = getattr(settings, 'USER_CACHE_TIMEOUT', 5 * 60)
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
 
 class EmailOrUsernameModelBackend(ModelBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
         UserModel = get_user_model()
-        # Use case-insensitive lookup and avoid get() which can raise MultipleObjectsReturned
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
         if username is None or password is None:
             return None
 
-        # Try to find a matching user by username or email (case-insensitive)
-        qs = UserModel.objects.filter(Q(username__iexact=username) | Q(email__iexact=username))
-        user = qs.first()
-        if user and user.check_password(password):
+        user = find_user_by_login(username)
+        if user is None:
+            # Hash anyway so response time doesn't reveal whether the account exists
+            UserModel().set_password(password)
+            return None
+        if user.check_password(password):
             return user
         return None
-    
\ No newline at end of file
+
+    def get_user(self, user_id):
+        """Load the session's user from the cache; saving the user drops the cached copy.
+
+        Only with a shared cache: a per-process cache would keep serving a banned
+        user or an old password hash to every worker but the one that saved it.
+        """
+        shared = getattr(settings, 'SHARED_CACHE', False)
+        key = user_cache_key(user_id)
+        user = cache.get(key) if shared else None
+        if user is None:
+            UserModel = get_user_model()
+            try:
+                user = UserModel._default_manager.get(pk=user_id)
+            except UserModel.DoesNotExist:
+                return None
+            if shared:
+                cache.set(key, user, USER_CACHE_TIMEOUT)
+        # Banned users are deactivated, which logs them out on their next request
+        return user if self.user_can_authenticate(user) else None
+
+
+def find_user_by_login(login):
+    """Return the user whose e-mail or username matches ``login`` (ignoring case), or None.
+
+    One query, served by the Lower(email) and Lower(username) indexes. An e-mail
+    match wins if the value is one user's e-mail and another's username.
+    """
+    UserModel = get_user_model()
+    login = Lower(Value(login))
+    email_match = Exact(Lower('email'), login)
+    return (
+        UserModel.objects.filter(Q(email_match, ~Q(email='')) | Exact(Lower('username'), login))
+        .order_by(Case(When(email_match, then=Value(0)), default=Value(1), output_field=IntegerField()))
+        .first()
+    )
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches, Tags.security)
+def check_login_throttle_cache(app_configs, **kwargs):
+    """Warn when login throttle counters live in a cache private to each worker"""
+    alias = getattr(settings, 'LOGIN_THROTTLE_CACHE', 'default')
+    if not isinstance(caches[alias], LocMemCache):
+        return []
+    return [
+        Warning(
+            f'LOGIN_THROTTLE_CACHE ({alias!r}) is a local-memory cache, so every worker '
+            'process counts failed logins separately and the limits are multiplied by the '
+            'number of workers.',
+            hint='Point CACHE_BACKEND/CACHE_LOCATION (or LOGIN_THROTTLE_CACHE) at Redis or Memcached.',
+            id='authentication.W001',
+        )
+    ]
@@ -1,5 +1,7 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
+from django.db.models.functions import Lower
+from django.db.models.lookups import Exact
 from .models import CustomUser
 
 class CustomUserCreationForm(UserCreationForm):
@@ -76,7 +78,7 @@ class CustomUserCreationForm(UserCreationForm):
         if email:
             email = email.lower()
             # Ensure no other user exists with this email
-            if CustomUser.objects.filter(email__iexact=email).exists():
+            if CustomUser.objects.filter(Exact(Lower('email'), email)).exists():
                 raise forms.ValidationError('An account with this email already exists.')
         return email
 
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:03
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count, F
+from django.db.models.functions import Lower
+
+
+def dedupe_emails(apps, schema_editor):
+    """Leave one account per e-mail address (ignoring case) so the unique constraint can be added.
+
+    The most recently active account keeps the address; the others have it
+    cleared and can still sign in with their username.
+    """
+    CustomUser = apps.get_model('authentication', 'CustomUser')
+    duplicated = (
+        CustomUser.objects.exclude(email='')
+        .annotate(email_lower=Lower('email'))
+        .values('email_lower')
+        .annotate(rows=Count('id'))
+        .filter(rows__gt=1)
+        .values_list('email_lower', flat=True)
+    )
+    for email in list(duplicated):
+        ids = list(
+            CustomUser.objects.annotate(email_lower=Lower('email'))
+            .filter(email_lower=email)
+            .order_by(F('last_login').desc(nulls_last=True), 'id')
+            .values_list('id', flat=True)
+        )
+        CustomUser.objects.filter(id__in=ids[1:]).update(email='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('authentication', '0005_customuser_banned_at_customuser_banned_by_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_emails, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(django.db.models.functions.text.Lower('username'), name='user_username_lower_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='customuser',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), condition=models.Q(('email', ''), _negated=True), name='unique_email_ci', violation_error_message='An account with this email already exists.'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Lower
 
 
 class CustomUser(AbstractUser):
@@ -51,12 +53,15 @@ class CustomUser(AbstractUser):
         return self.username
 
     class Meta:
-        # Consider adding a database-level unique constraint on email to prevent duplicates.
-        # To enforce this, run makemigrations/migrate after ensuring existing data is cleaned.
-        # Uncomment the UniqueConstraint below and run migrations if you want DB-level enforcement.
-        #
-        # constraints = [
-        #     models.UniqueConstraint(fields=['email'], name='unique_email')
-        # ]
-        pass
-
+        constraints = [
+            # Case-insensitive, and also the index for e-mail logins; accounts without an e-mail are exempt
+            models.UniqueConstraint(
+                Lower('email'),
+                name='unique_email_ci',
+                condition=~Q(email=''),
+                violation_error_message='An account with this email already exists.',
+            ),
+        ]
+        indexes = [
+            models.Index(Lower('username'), name='user_username_lower_idx'),
+        ]
@@ -0,0 +1,15 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import user_cache_key
+from .models import CustomUser
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Drop the cached session user after profile edits, bans, unbans and password changes"""
+    key = user_cache_key(instance.pk)
+    transaction.on_commit(lambda: cache.delete(key))
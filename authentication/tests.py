@@ -1,3 +1,206 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from crewup import badges
+from . import checks, throttling
+from .backends import EmailOrUsernameModelBackend, find_user_by_login, user_cache_key
+from .models import CustomUser
+
+
+class LoginLookupTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='CrewBrand', email='hello@brand.com', password='s3cret-pass', user_type='brand'
+        )
+
+    def test_matches_email_or_username_ignoring_case(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(find_user_by_login('HELLO@Brand.com'), self.user)
+        self.assertEqual(find_user_by_login('crewbrand'), self.user)
+        self.assertIsNone(find_user_by_login('nobody'))
+
+    def test_email_match_wins_over_username(self):
+        other = CustomUser.objects.create_user(username='hello@brand.com', email='other@brand.com')
+
+        self.assertEqual(find_user_by_login('hello@brand.com'), self.user)
+        self.assertEqual(find_user_by_login('other@brand.com'), other)
+
+    def test_login_view_authenticates_with_email(self):
+        response = self.client.post(reverse('authentication:login'), {
+            'email': 'Hello@Brand.com', 'password': 's3cret-pass',
+        })
+
+        self.assertRedirects(response, reverse('brand_dashboard'), fetch_redirect_response=False)
+        self.assertEqual(int(self.client.session['_auth_user_id']), self.user.id)
+
+    def test_wrong_password_is_rejected(self):
+        response = self.client.post(reverse('authentication:login'), {'email': 'crewbrand', 'password': 'nope'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+    def test_email_is_unique_ignoring_case(self):
+        with self.assertRaises(IntegrityError):
+            CustomUser.objects.create_user(username='copy', email='HELLO@brand.com')
+
+    def test_blank_emails_are_not_unique(self):
+        CustomUser.objects.create_user(username='one')
+        CustomUser.objects.create_user(username='two')
+
+        self.assertEqual(CustomUser.objects.filter(email='').count(), 2)
+
+    def test_constraint_is_validated_on_full_clean(self):
+        user = CustomUser(username='copy', email='Hello@brand.com')
+        user.set_password('s3cret-pass')
+
+        with self.assertRaisesMessage(ValidationError, 'An account with this email already exists.'):
+            user.full_clean()
+
+
+@override_settings(SHARED_CACHE=True, SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+class CachedSessionUserTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username='brand', email='brand@example.com', user_type='brand')
+        self.backend = EmailOrUsernameModelBackend()
+
+    def test_user_is_cached_until_saved(self):
+        with self.assertNumQueries(1):
+            self.backend.get_user(self.user.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.backend.get_user(self.user.id).username, 'brand')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.company_name = 'Acme'
+            self.user.save()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.backend.get_user(self.user.id).company_name, 'Acme')
+
+    @override_settings(SHARED_CACHE=False)
+    def test_user_is_not_cached_in_a_per_process_cache(self):
+        self.backend.get_user(self.user.id)
+
+        with self.assertNumQueries(1):
+            self.backend.get_user(self.user.id)
+        self.assertIsNone(cache.get(user_cache_key(self.user.id)))
+
+    def test_banned_user_is_logged_out(self):
+        self.client.force_login(self.user)
+        self.backend.get_user(self.user.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_banned = True
+            self.user.is_active = False
+            self.user.save()
+
+        response = self.client.get(reverse('pricing'))
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+
+    def test_password_change_ends_other_sessions(self):
+        self.client.force_login(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('n3w-password')
+            self.user.save()
+
+        self.client.get(reverse('pricing'))
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+    def test_pages_skip_session_and_user_queries_once_warm(self):
+        self.client.force_login(self.user)
+        badges.get_badges(self.user)
+        self.client.get(reverse('pricing'))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('pricing'))
+        self.assertEqual(response.context['user'], self.user)
+
+
+# Hour-long windows, so a test's failures never straddle a bucket boundary and get discounted
+@override_settings(LOGIN_THROTTLE_POLICIES={
+    'ip': {'limit': 6, 'window': 60 * 60, 'lockout': 300},
+    'account': {'limit': 3, 'window': 60 * 60, 'lockout': 300},
+})
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username='brand', email='brand@example.com', password='s3cret-pass', user_type='brand'
+        )
+        self.url = reverse('authentication:login')
+
+    def fail(self, login='brand', ip='10.0.0.1'):
+        return self.client.post(self.url, {'email': login, 'password': 'wrong'}, REMOTE_ADDR=ip)
+
+    def test_account_is_locked_out_without_touching_the_database(self):
+        for _ in range(3):
+            self.fail('BRAND')
+
+        with self.assertNumQueries(0):
+            response = self.client.post(self.url, {'email': 'brand', 'password': 's3cret-pass'}, REMOTE_ADDR='10.0.0.1')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertLessEqual(int(response['Retry-After']), 300)
+        self.assertNotIn('_auth_user_id', self.client.session)
+        self.assertEqual(throttling.metrics(), {'failures': 3, 'blocked': 1, 'lockouts': 1})
+
+    def test_account_is_locked_out_across_ips(self):
+        for n in range(3):
+            self.fail('brand', f'10.0.0.{n}')
+
+        response = self.client.post(self.url, {'email': 'brand', 'password': 's3cret-pass'}, REMOTE_ADDR='10.0.0.99')
+
+        self.assertEqual(response.status_code, 429)
+
+    def test_owner_logs_in_from_a_known_client_while_account_is_attacked(self):
+        self.client.post(self.url, {'email': 'brand', 'password': 's3cret-pass'}, REMOTE_ADDR='10.0.0.2')
+        self.client.logout()
+        for n in range(3):
+            self.fail('brand', f'10.0.1.{n}')
+
+        response = self.client.post(self.url, {'email': 'brand', 'password': 's3cret-pass'}, REMOTE_ADDR='10.0.0.2')
+
+        self.assertRedirects(response, reverse('brand_dashboard'), fetch_redirect_response=False)
+        self.assertEqual(self.fail('brand', '10.0.1.9').status_code, 429)
+
+    def test_ip_is_locked_out_across_accounts(self):
+        for n in range(6):
+            self.fail(f'nobody{n}')
+
+        self.assertEqual(self.fail('someone-else').status_code, 429)
+        # Other clients still log in normally
+        response = self.client.post(self.url, {'email': 'brand', 'password': 's3cret-pass'}, REMOTE_ADDR='10.0.0.9')
+        self.assertRedirects(response, reverse('brand_dashboard'), fetch_redirect_response=False)
+
+    def test_successful_login_clears_account_failures(self):
+        self.fail()
+        self.fail()
+        self.client.post(self.url, {'email': 'brand', 'password': 's3cret-pass'}, REMOTE_ADDR='10.0.0.1')
+        self.client.logout()
+
+        self.fail()
+        self.assertEqual(self.fail().status_code, 200)
+        self.assertEqual(throttling.metrics()['lockouts'], 0)
+
+    @override_settings(LOGIN_THROTTLE_IP_HEADER='HTTP_X_FORWARDED_FOR', LOGIN_THROTTLE_PROXY_COUNT=1)
+    def test_client_ip_is_the_one_the_trusted_proxy_saw(self):
+        request = RequestFactory().post(self.url, HTTP_X_FORWARDED_FOR='1.2.3.4, 10.0.0.7', REMOTE_ADDR='172.16.0.1')
+        self.assertEqual(throttling.client_ip(request), '10.0.0.7')
+
+        # Rotating the client-supplied part doesn't escape the IP limit
+        for n in range(6):
+            self.client.post(self.url, {'email': f'nobody{n}', 'password': 'wrong'},
+                             HTTP_X_FORWARDED_FOR=f'9.9.9.{n}, 10.0.0.7')
+        response = self.client.post(self.url, {'email': 'brand', 'password': 's3cret-pass'},
+                                    HTTP_X_FORWARDED_FOR='8.8.8.8, 10.0.0.7')
+        self.assertEqual(response.status_code, 429)
+
+    def test_process_local_throttle_cache_is_flagged(self):
+        self.assertEqual([warning.id for warning in checks.check_login_throttle_cache(None)], ['authentication.W001'])
+
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+            self.assertEqual(checks.check_login_throttle_cache(None), [])
@@ -0,0 +1,153 @@
+"""Login throttling with sliding-window failure counters per client IP and per account.
+
+Counters and lockouts live in the cache named by LOGIN_THROTTLE_CACHE, so a
+blocked attempt costs one cache round trip and never reaches the database or
+the password hasher. An account's lockout is soft: it turns away new clients,
+however many IPs they spread over, but not the clients its owner has
+already logged in from.
+"""
+import hashlib
+import logging
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+IP = 'ip'
+ACCOUNT = 'account'
+
+# Failures allowed per sliding window (seconds) before the key is locked out (seconds)
+DEFAULT_POLICIES = {
+    IP: {'limit': 20, 'window': 5 * 60, 'lockout': 15 * 60},
+    ACCOUNT: {'limit': 5, 'window': 15 * 60, 'lockout': 15 * 60},
+}
+
+FAILURES = 'failures'
+BLOCKED = 'blocked'
+LOCKOUTS = 'lockouts'
+METRICS = [FAILURES, BLOCKED, LOCKOUTS]
+
+# A client IP that has logged in to an account gets past that account's lockout this long (seconds)
+KNOWN_CLIENT_TIMEOUT = 30 * 24 * 60 * 60
+
+
+def _cache():
+    return caches[getattr(settings, 'LOGIN_THROTTLE_CACHE', 'default')]
+
+
+def _policies():
+    policies = getattr(settings, 'LOGIN_THROTTLE_POLICIES', DEFAULT_POLICIES)
+    # A scope set to None is not throttled
+    return {scope: policy for scope, policy in policies.items() if policy}
+
+
+def client_ip(request):
+    """The address that connected to the first trusted proxy, or REMOTE_ADDR without proxies.
+
+    Each proxy appends the address it received the request from, so with N trusted
+    proxies the client is the Nth entry from the right; anything further left was
+    sent by the client and can't be trusted.
+    """
+    header = getattr(settings, 'LOGIN_THROTTLE_IP_HEADER', None)
+    proxies = getattr(settings, 'LOGIN_THROTTLE_PROXY_COUNT', 1)
+    if header and proxies and request.META.get(header):
+        # e.g. X-Forwarded-For: spoofed, client, proxy1
+        addresses = [address.strip() for address in request.META[header].split(',')]
+        return addresses[-min(proxies, len(addresses))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _hash(value):
+    return hashlib.sha256(value.encode()).hexdigest()
+
+
+def _identities(request, login):
+    # Accounts are keyed by the login as typed (case-folded), so checking them needs no lookup
+    identities = {IP: client_ip(request), ACCOUNT: (login or '').strip().lower()}
+    return {scope: _hash(identities[scope]) for scope in _policies()}
+
+
+def _counter_key(scope, identity, bucket):
+    return f'throttle:{scope}:{identity}:{bucket}'
+
+
+def _lock_key(scope, identity):
+    return f'throttle:lock:{scope}:{identity}'
+
+
+def _known_key(request, account):
+    return f'throttle:known:{account}:{_hash(client_ip(request))}'
+
+
+def _incr(cache, key, timeout):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout)
+        return cache.incr(key)
+
+
+def _record_metric(cache, name):
+    _incr(cache, f'throttle:metrics:{name}', None)
+
+
+def check(request, login):
+    """Seconds until this IP or account may try to log in again, or 0 if it may try now"""
+    cache = _cache()
+    identities = _identities(request, login)
+    scopes = {_lock_key(scope, identity): scope for scope, identity in identities.items()}
+    keys = list(scopes)
+    if ACCOUNT in identities:
+        keys.append(_known_key(request, identities[ACCOUNT]))
+    values = cache.get_many(keys)
+
+    # The account lockout is soft: it doesn't apply to clients the owner has logged in from
+    known = ACCOUNT in identities and values.get(keys[-1], False)
+    locks = [value for key, value in values.items() if key in scopes and not (known and scopes[key] == ACCOUNT)]
+    if not locks:
+        return 0
+    _record_metric(cache, BLOCKED)
+    return max(0, math.ceil(max(locks) - time.time()))
+
+
+def record_failure(request, login):
+    """Count a failed login and lock out any IP or account that is over its limit"""
+    cache = _cache()
+    now = time.time()
+    _record_metric(cache, FAILURES)
+
+    for scope, identity in _identities(request, login).items():
+        policy = _policies()[scope]
+        window = policy['window']
+        bucket = int(now // window)
+        current = _incr(cache, _counter_key(scope, identity, bucket), window * 2)
+        previous = cache.get(_counter_key(scope, identity, bucket - 1), 0)
+        # Sliding window: the previous bucket counts for the share of it still inside the window
+        failures = current + previous * (1 - (now % window) / window)
+
+        if failures >= policy['limit'] and policy['lockout']:
+            if cache.add(_lock_key(scope, identity), now + policy['lockout'], policy['lockout']):
+                _record_metric(cache, LOCKOUTS)
+                logger.warning('Locked out %s %s for %ss after %d failed logins',
+                               scope, client_ip(request) if scope == IP else identity[:12],
+                               policy['lockout'], failures)
+
+
+def record_success(request, login):
+    """Forget an account's failures and let this client past its lockout from now on"""
+    if ACCOUNT not in _policies():
+        return
+    cache = _cache()
+    identity = _identities(request, login)[ACCOUNT]
+    bucket = int(time.time() // _policies()[ACCOUNT]['window'])
+    cache.delete_many([_counter_key(ACCOUNT, identity, bucket), _counter_key(ACCOUNT, identity, bucket - 1)])
+    cache.set(_known_key(request, identity), True, KNOWN_CLIENT_TIMEOUT)
+
+
+def metrics():
+    """``{'failures': n, 'blocked': n, 'lockouts': n}`` since the cache was last cleared"""
+    values = _cache().get_many([f'throttle:metrics:{name}' for name in METRICS])
+    return {name: values.get(f'throttle:metrics:{name}', 0) for name in METRICS}
@@ -3,6 +3,7 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import login, authenticate, logout
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from . import throttling
 from .forms import CustomUserCreationForm, BrandProfileForm, InfluencerProfileForm
 from .models import CustomUser
 
@@ -54,23 +55,17 @@ def login_view(request):
             messages.error(request, 'Please provide both email/username and password.')
             return render(request, 'authentication/login.html')
 
-        # Try to find user by email or username
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-        
-        user = None
-        # First try to find by email
-        try:
-            user_obj = User.objects.get(email__iexact=email_or_username)
-            # Authenticate with username
-            user = authenticate(request, username=user_obj.username, password=password)
-        except User.DoesNotExist:
-            # If not found by email, try username
-            try:
-                user_obj = User.objects.get(username__iexact=email_or_username)
-                user = authenticate(request, username=user_obj.username, password=password)
-            except User.DoesNotExist:
-                pass
+        # Locked-out IPs and accounts are turned away before the user lookup and password hash
+        retry_after = throttling.check(request, email_or_username)
+        if retry_after:
+            minutes = max(1, round(retry_after / 60))
+            messages.error(request, f'Too many failed login attempts. Please try again in {minutes} minute(s).')
+            response = render(request, 'authentication/login.html', status=429)
+            response['Retry-After'] = str(retry_after)
+            return response
+
+        # The backend matches e-mail or username, ignoring case, in a single query
+        user = authenticate(request, username=email_or_username, password=password)
 
         if user is not None:
             # If user is inactive, prevent login
@@ -78,6 +73,7 @@ def login_view(request):
                 messages.error(request, 'This account is inactive. Please contact support.')
                 return render(request, 'authentication/login.html')
 
+            throttling.record_success(request, email_or_username)
             login(request, user)
 
             # Set session expiry based on remember me
@@ -92,6 +88,7 @@ def login_view(request):
             else:
                 return redirect('admin_dashboard')
         else:
+            throttling.record_failure(request, email_or_username)
             # Generic message for invalid credentials
             messages.error(request, 'Invalid email/username or password. Please check your credentials and try again.')
 
@@ -1,12 +1,12 @@
 from django.contrib import admin
-from .models import Campaign, CampaignApplication, InfluencerAnalytics, CustomOffer
+from .models import Campaign, CampaignApplication, InfluencerAnalytics, CustomOffer, OfferMessage, ActivityEvent
 
 @admin.register(Campaign)
 class CampaignAdmin(admin.ModelAdmin):
-    list_display = ('title', 'category', 'platform', 'budget', 'created_at')
+    list_display = ('title', 'category', 'platform', 'budget', 'application_count', 'view_count', 'created_at')
     list_filter = ('category', 'platform', 'created_at')
     search_fields = ('title', 'description')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('application_count', 'approved_count', 'view_count', 'created_at', 'updated_at')
 
 @admin.register(CampaignApplication)
 class CampaignApplicationAdmin(admin.ModelAdmin):
@@ -21,9 +21,29 @@ class InfluencerAnalyticsAdmin(admin.ModelAdmin):
     search_fields = ('influencer__username',)
     readonly_fields = ('last_updated',)
 
+class OfferMessageInline(admin.TabularInline):
+    model = OfferMessage
+    extra = 0
+    fields = ('sender', 'body', 'counter_amount', 'created_at')
+    readonly_fields = ('sender', 'body', 'counter_amount', 'created_at')
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 @admin.register(CustomOffer)
 class CustomOfferAdmin(admin.ModelAdmin):
     list_display = ('title', 'brand', 'influencer', 'offer_amount', 'status', 'created_at')
     list_filter = ('status', 'created_at')
     search_fields = ('title', 'brand__username', 'influencer__username')
     readonly_fields = ('created_at', 'updated_at')
+    inlines = [OfferMessageInline]
+
+@admin.register(ActivityEvent)
+class ActivityEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'influencer', 'campaign', 'amount', 'created_at')
+    list_filter = ('kind', 'created_at')
+    search_fields = ('influencer__username', 'campaign__title')
+    readonly_fields = ('kind', 'influencer', 'campaign', 'object_id', 'amount', 'created_at')
+
+    def has_change_permission(self, request, obj=None):
+        return False
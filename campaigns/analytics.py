@@ -0,0 +1,342 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import ActivityEvent, AnalyticsCheckpoint, Campaign, CampaignApplication, CustomOffer, InfluencerAnalytics
+
+CHECKPOINT_NAME = 'analytics'
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_CHUNK_SIZE = 1000
+
+# Events are folded only once they are this old (seconds). Ids are assigned at insert but
+# become visible at commit, so a lower id can appear after a higher one has been folded;
+# the lag gives such transactions time to commit before the checkpoint moves past them.
+SAFETY_LAG = getattr(settings, 'ANALYTICS_SAFETY_LAG', 30)
+
+# Fields recomputed from source tables by reconcile(); profile views only live in the event log
+RECONCILED_FIELDS = ['total_applications', 'approved_applications', 'total_earnings']
+
+
+def increment(influencer_id, **deltas):
+    """Atomically add deltas to an influencer's analytics row, creating it if missing.
+
+    The common case is a single ``UPDATE ... SET col = col + n`` statement, so
+    concurrent writers never overwrite each other's increments. Call it inside
+    the same ``transaction.atomic()`` block as the change it records.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    updates['last_updated'] = timezone.now()
+
+    rows = InfluencerAnalytics.objects.filter(influencer_id=influencer_id).update(**updates)
+    if rows:
+        return
+
+    try:
+        # Savepoint so a lost creation race doesn't break the outer transaction
+        with transaction.atomic():
+            InfluencerAnalytics.objects.create(influencer_id=influencer_id, **deltas)
+    except IntegrityError:
+        InfluencerAnalytics.objects.filter(influencer_id=influencer_id).update(**updates)
+
+
+# Request-path recorders: each is a single INSERT into the activity log
+
+def record_event(kind, influencer_id=None, campaign_id=None, object_id=None, amount=None):
+    return ActivityEvent.objects.create(
+        kind=kind,
+        influencer_id=influencer_id,
+        campaign_id=campaign_id,
+        object_id=object_id,
+        amount=amount,
+    )
+
+
+def record_application(application):
+    return record_event(ActivityEvent.APPLIED, application.influencer_id, application.campaign_id, application.id)
+
+
+def record_approval(application):
+    return record_event(ActivityEvent.APPROVED, application.influencer_id, application.campaign_id, application.id)
+
+
+def record_rejection(application):
+    return record_event(ActivityEvent.REJECTED, application.influencer_id, application.campaign_id, application.id)
+
+
+def record_offer_sent(offer):
+    return record_event(ActivityEvent.OFFER_SENT, offer.influencer_id, offer.campaign_id, offer.id, offer.offer_amount)
+
+
+def record_offer_accepted(offer):
+    return record_event(ActivityEvent.OFFER_ACCEPTED, offer.influencer_id, offer.campaign_id, offer.id, offer.offer_amount)
+
+
+def record_offer_rejected(offer):
+    return record_event(ActivityEvent.OFFER_REJECTED, offer.influencer_id, offer.campaign_id, offer.id)
+
+
+def record_bulk(kind, rows, campaign_id=None, batch_size=500):
+    """Append one event per ``(object_id, influencer_id)`` pair in batched INSERTs.
+
+    Rows may carry their own campaign as ``(object_id, influencer_id, campaign_id)``.
+    """
+    return ActivityEvent.objects.bulk_create(
+        [
+            ActivityEvent(
+                kind=kind,
+                influencer_id=influencer_id,
+                campaign_id=row_campaign[0] if row_campaign else campaign_id,
+                object_id=object_id,
+            )
+            for object_id, influencer_id, *row_campaign in rows
+        ],
+        batch_size=batch_size,
+    )
+
+
+def record_campaign_view(campaign_id):
+    return record_event(ActivityEvent.CAMPAIGN_VIEWED, campaign_id=campaign_id)
+
+
+def record_profile_view(influencer_id):
+    return record_event(ActivityEvent.PROFILE_VIEWED, influencer_id=influencer_id)
+
+
+# Materializer
+
+def _fold(events):
+    """Reduce a batch of events to per-influencer and per-campaign counter deltas"""
+    influencer_deltas = defaultdict(lambda: defaultdict(int))
+    campaign_deltas = defaultdict(lambda: defaultdict(int))
+
+    for kind, influencer_id, campaign_id, amount in events:
+        if kind == ActivityEvent.APPLIED:
+            influencer_deltas[influencer_id]['total_applications'] += 1
+            campaign_deltas[campaign_id]['application_count'] += 1
+        elif kind == ActivityEvent.APPROVED:
+            influencer_deltas[influencer_id]['approved_applications'] += 1
+            campaign_deltas[campaign_id]['approved_count'] += 1
+        elif kind == ActivityEvent.OFFER_ACCEPTED:
+            influencer_deltas[influencer_id]['total_earnings'] += amount or 0
+        elif kind == ActivityEvent.CAMPAIGN_VIEWED:
+            campaign_deltas[campaign_id]['view_count'] += 1
+        elif kind == ActivityEvent.PROFILE_VIEWED:
+            influencer_deltas[influencer_id]['profile_views'] += 1
+
+    # Events whose user or campaign has been deleted carry a null key
+    influencer_deltas.pop(None, None)
+    campaign_deltas.pop(None, None)
+    return influencer_deltas, campaign_deltas
+
+
+def materialize_batch(batch_size=DEFAULT_BATCH_SIZE, now=None):
+    """Fold the next batch of settled events after the checkpoint. Returns the number folded."""
+    cutoff = (now or timezone.now()) - timedelta(seconds=SAFETY_LAG)
+    with transaction.atomic():
+        checkpoint, _ = AnalyticsCheckpoint.objects.select_for_update().get_or_create(name=CHECKPOINT_NAME)
+
+        events = list(
+            ActivityEvent.objects.filter(id__gt=checkpoint.last_event_id)
+            .order_by('id')
+            .values_list('id', 'kind', 'influencer_id', 'campaign_id', 'amount', 'created_at')[:batch_size]
+        )
+        # Stop at the first event inside the safety lag so the checkpoint never passes it
+        for index, event in enumerate(events):
+            if event[-1] > cutoff:
+                events = events[:index]
+                break
+        if not events:
+            return 0
+
+        influencer_deltas, campaign_deltas = _fold(event[1:-1] for event in events)
+
+        for influencer_id, deltas in influencer_deltas.items():
+            increment(influencer_id, **deltas)
+
+        for campaign_id, deltas in campaign_deltas.items():
+            Campaign.objects.filter(id=campaign_id).update(
+                **{field: F(field) + delta for field, delta in deltas.items()}
+            )
+
+        checkpoint.last_event_id = events[-1][0]
+        checkpoint.save(update_fields=['last_event_id', 'updated_at'])
+
+    return len(events)
+
+
+def materialize(batch_size=DEFAULT_BATCH_SIZE, now=None):
+    """Fold all settled events, one transaction per batch. Returns the number folded."""
+    now = now or timezone.now()
+    total = 0
+    while True:
+        folded = materialize_batch(batch_size, now)
+        total += folded
+        if folded < batch_size:
+            return total
+
+
+def rebuild(batch_size=DEFAULT_BATCH_SIZE, now=None):
+    """Reset every counter and replay the whole event log from the start"""
+    with transaction.atomic():
+        InfluencerAnalytics.objects.update(
+            total_applications=0,
+            approved_applications=0,
+            total_earnings=0,
+            profile_views=0,
+            last_updated=timezone.now(),
+        )
+        Campaign.objects.update(application_count=0, approved_count=0, view_count=0)
+        AnalyticsCheckpoint.objects.update_or_create(name=CHECKPOINT_NAME, defaults={'last_event_id': 0})
+    return materialize(batch_size, now)
+
+
+# Reconciliation
+
+def _per_row(queryset, field, aggregate):
+    """Correlated subquery aggregating ``queryset`` rows whose ``field`` is the outer row's id"""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('id')})
+            .order_by()
+            .values(field)
+            .annotate(value=aggregate)
+            .values('value')
+        ),
+        Value(0),
+        output_field=aggregate.output_field,
+    )
+
+
+def _reconcile_influencers(influencer_ids, checkpoint_id):
+    """Recompute analytics for one chunk of influencers in a single grouped query.
+
+    Totals come from applications and accepted offers, less what events past the
+    checkpoint will add once folded. One statement sees one snapshot, so a change
+    committed mid-reconcile is either in both or in neither.
+    """
+    User = get_user_model()
+    pending = ActivityEvent.objects.filter(id__gt=checkpoint_id)
+    applications = CampaignApplication.objects.all()
+    totals = (
+        User.objects.filter(id__in=influencer_ids)
+        .annotate(
+            applications=_per_row(applications, 'influencer_id', Count('id')),
+            # The materializer counts APPROVED events, which mark the move to 'approved'
+            approved=_per_row(applications.filter(status='approved'), 'influencer_id', Count('id')),
+            earnings=_per_row(
+                CustomOffer.objects.filter(status='accepted'), 'influencer_id',
+                Sum('offer_amount', output_field=DecimalField(max_digits=12, decimal_places=2)),
+            ),
+            pending_applications=_per_row(pending.filter(kind=ActivityEvent.APPLIED), 'influencer_id', Count('id')),
+            pending_approved=_per_row(pending.filter(kind=ActivityEvent.APPROVED), 'influencer_id', Count('id')),
+            pending_earnings=_per_row(
+                pending.filter(kind=ActivityEvent.OFFER_ACCEPTED), 'influencer_id',
+                Sum('amount', output_field=DecimalField(max_digits=12, decimal_places=2)),
+            ),
+        )
+        .values_list('id', 'applications', 'approved', 'earnings',
+                     'pending_applications', 'pending_approved', 'pending_earnings')
+    )
+    existing = InfluencerAnalytics.objects.in_bulk(influencer_ids, field_name='influencer_id')
+
+    now = timezone.now()
+    to_update = []
+    to_create = []
+    for influencer_id, applied, approved, earnings, pending_applied, pending_approved, pending_earnings in totals:
+        values = {
+            'total_applications': max(applied - pending_applied, 0),
+            'approved_applications': max(approved - pending_approved, 0),
+            'total_earnings': max(earnings - pending_earnings, 0),
+        }
+
+        analytics = existing.get(influencer_id)
+        if analytics is None:
+            if any(values.values()):
+                to_create.append(InfluencerAnalytics(influencer_id=influencer_id, **values))
+            continue
+
+        if any(getattr(analytics, field) != value for field, value in values.items()):
+            for field, value in values.items():
+                setattr(analytics, field, value)
+            analytics.last_updated = now
+            to_update.append(analytics)
+
+    InfluencerAnalytics.objects.bulk_update(to_update, RECONCILED_FIELDS + ['last_updated'])
+    InfluencerAnalytics.objects.bulk_create(to_create, ignore_conflicts=True)
+
+    return len(to_update) + len(to_create)
+
+
+def _reconcile_campaigns(campaign_ids, checkpoint_id):
+    """Recompute application and approval counters for one chunk of campaigns.
+
+    Same approach as ``_reconcile_influencers``; view counts only live in the event log.
+    """
+    pending = ActivityEvent.objects.filter(id__gt=checkpoint_id)
+    applications = CampaignApplication.objects.all()
+    totals = (
+        Campaign.objects.filter(id__in=campaign_ids)
+        .annotate(
+            applied=_per_row(applications, 'campaign_id', Count('id')),
+            approved=_per_row(applications.filter(status='approved'), 'campaign_id', Count('id')),
+            pending_applications=_per_row(pending.filter(kind=ActivityEvent.APPLIED), 'campaign_id', Count('id')),
+            pending_approved=_per_row(pending.filter(kind=ActivityEvent.APPROVED), 'campaign_id', Count('id')),
+        )
+        .values_list('id', 'application_count', 'approved_count',
+                     'applied', 'approved', 'pending_applications', 'pending_approved')
+    )
+
+    changed = 0
+    for campaign_id, application_count, approved_count, applied, approved, pending_applied, pending_approved in totals:
+        values = {
+            'application_count': max(applied - pending_applied, 0),
+            'approved_count': max(approved - pending_approved, 0),
+        }
+        if values != {'application_count': application_count, 'approved_count': approved_count}:
+            changed += Campaign.objects.filter(id=campaign_id).update(**values)
+    return changed
+
+
+def _reconcile_in_chunks(queryset, reconcile_chunk, chunk_size):
+    """Stream ``queryset`` ids in primary-key chunks, each recomputed under the checkpoint lock"""
+    seen = changed = 0
+    last_id = 0
+    while True:
+        ids = list(queryset.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return seen, changed
+
+        with transaction.atomic():
+            checkpoint, _ = AnalyticsCheckpoint.objects.select_for_update().get_or_create(name=CHECKPOINT_NAME)
+            changed += reconcile_chunk(ids, checkpoint.last_event_id)
+        seen += len(ids)
+        last_id = ids[-1]
+
+
+def reconcile(chunk_size=DEFAULT_CHUNK_SIZE):
+    """Rebuild influencer totals and campaign counters from applications and offers.
+
+    Settled events are folded first. Each chunk then holds the materializer's
+    checkpoint lock while it is recomputed, and events past the checkpoint are
+    left for the materializer to add. Rows are streamed in primary-key chunks,
+    so memory stays bounded by the chunk size. Returns
+    ``(influencers_seen, campaigns_seen, rows_changed)``.
+    """
+    User = get_user_model()
+    materialize()
+
+    influencers, influencers_changed = _reconcile_in_chunks(
+        User.objects.filter(user_type='influencer'), _reconcile_influencers, chunk_size,
+    )
+    campaigns, campaigns_changed = _reconcile_in_chunks(Campaign.objects.all(), _reconcile_campaigns, chunk_size)
+    return influencers, campaigns, influencers_changed + campaigns_changed
@@ -1,5 +1,5 @@
 from django import forms
-from .models import Campaign, CampaignApplication, CustomOffer
+from .models import Campaign, CampaignApplication, CustomOffer, OfferMessage
 
 class CampaignForm(forms.ModelForm):
     class Meta:
@@ -29,6 +29,8 @@ class CampaignForm(forms.ModelForm):
         }
 
 class CampaignApplicationForm(forms.ModelForm):
+    idempotency_key = forms.UUIDField(required=False, widget=forms.HiddenInput)
+
     class Meta:
         model = CampaignApplication
         fields = ['application_message']
@@ -77,4 +79,32 @@ class CustomOfferForm(forms.ModelForm):
                 'class': 'form-control'
             }),
         }
-        
\ No newline at end of file
+        
+class OfferMessageForm(forms.ModelForm):
+    class Meta:
+        model = OfferMessage
+        fields = ['body', 'counter_amount']
+        widgets = {
+            'body': forms.Textarea(attrs={
+                'class': 'form-control',
+                'rows': 3,
+                'placeholder': 'Write a message...'
+            }),
+            'counter_amount': forms.NumberInput(attrs={
+                'class': 'form-control',
+                'step': '0.01',
+                'placeholder': 'Counter-offer amount (optional)'
+            }),
+        }
+
+    def clean_counter_amount(self):
+        counter_amount = self.cleaned_data.get('counter_amount')
+        if counter_amount is not None and counter_amount <= 0:
+            raise forms.ValidationError('Counter-offer amount must be greater than zero.')
+        return counter_amount
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('body') and cleaned_data.get('counter_amount') is None:
+            raise forms.ValidationError('Write a message or propose a counter-offer amount.')
+        return cleaned_data
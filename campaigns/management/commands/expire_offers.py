@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from campaigns import offers
+
+
+class Command(BaseCommand):
+    help = 'Move pending custom offers past their deadline to expired'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=offers.DEFAULT_BATCH_SIZE,
+                            help='Number of offers expired per UPDATE')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running and expire offers as their deadlines pass')
+        parser.add_argument('--interval', type=float, default=300.0,
+                            help='Seconds to sleep between passes when looping')
+
+    def handle(self, *args, **options):
+        while True:
+            expired = offers.expire_overdue_offers(options['batch_size'])
+            if expired or not options['loop']:
+                self.stdout.write(f'Expired {expired} offers.')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
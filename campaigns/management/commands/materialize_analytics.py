@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from campaigns import analytics
+
+
+class Command(BaseCommand):
+    help = 'Fold new activity events into influencer analytics and campaign counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=analytics.DEFAULT_BATCH_SIZE,
+                            help='Number of events folded per transaction')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Reset all counters and replay the event log from the start')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running and fold new events as they arrive')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds to sleep between passes when looping')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        if options['rebuild']:
+            folded = analytics.rebuild(batch_size)
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt analytics from {folded} events.'))
+            if not options['loop']:
+                return
+
+        while True:
+            folded = analytics.materialize(batch_size)
+            if folded or not options['loop']:
+                self.stdout.write(f'Folded {folded} events.')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
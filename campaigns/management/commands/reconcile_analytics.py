@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from campaigns import analytics
+
+
+class Command(BaseCommand):
+    help = 'Recompute influencer totals and campaign counters from campaign applications and accepted offers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=analytics.DEFAULT_CHUNK_SIZE,
+                            help='Number of influencers or campaigns recomputed per chunk')
+
+    def handle(self, *args, **options):
+        influencers, campaigns, changed = analytics.reconcile(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Reconciled {influencers} influencers and {campaigns} campaigns, {changed} rows changed.'
+        ))
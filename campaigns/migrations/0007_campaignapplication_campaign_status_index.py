@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0006_campaignapplication_idempotency_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='campaignapplication',
+            index=models.Index(fields=['campaign', 'status', 'applied_at'], name='application_campaign_status'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0007_campaignapplication_campaign_status_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='campaignapplication',
+            index=models.Index(fields=['influencer', 'applied_at'], name='application_influencer'),
+        ),
+    ]
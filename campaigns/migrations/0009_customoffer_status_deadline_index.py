@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0008_campaignapplication_influencer_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='activityevent',
+            name='kind',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Application submitted'), (2, 'Application approved'), (3, 'Application rejected'), (4, 'Offer sent'), (5, 'Offer accepted'), (6, 'Offer rejected'), (7, 'Campaign viewed'), (8, 'Profile viewed'), (9, 'Offer expired')]),
+        ),
+        migrations.AddIndex(
+            model_name='customoffer',
+            index=models.Index(fields=['status', 'deadline'], name='offer_status_deadline'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0009_customoffer_status_deadline_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customoffer',
+            index=models.Index(fields=['influencer', 'status', 'created_at'], name='offer_influencer_status'),
+        ),
+        migrations.AddIndex(
+            model_name='customoffer',
+            index=models.Index(fields=['brand', 'status', 'created_at'], name='offer_brand_status'),
+        ),
+    ]
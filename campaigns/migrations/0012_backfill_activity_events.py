@@ -0,0 +1,71 @@
+from django.db import migrations
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+# ActivityEvent kinds, frozen as of this migration
+APPLIED = 1
+APPROVED = 2
+REJECTED = 3
+OFFER_SENT = 4
+OFFER_ACCEPTED = 5
+OFFER_REJECTED = 6
+OFFER_EXPIRED = 9
+
+APPLICATION_KINDS = {'approved': APPROVED, 'rejected': REJECTED}
+OFFER_KINDS = {'accepted': OFFER_ACCEPTED, 'rejected': OFFER_REJECTED, 'expired': OFFER_EXPIRED}
+
+
+def _without_event(queryset, ActivityEvent, kind):
+    return queryset.exclude(Exists(ActivityEvent.objects.filter(kind=kind, object_id=OuterRef('id'))))
+
+
+def backfill_events(apps, schema_editor):
+    """Log the applications and offers made before the event log, then replay it from the start.
+
+    Counters are reset and the checkpoint rewound, so the next materializer run
+    rebuilds every total from a complete log instead of adding to the old ones.
+    """
+    ActivityEvent = apps.get_model('campaigns', 'ActivityEvent')
+    AnalyticsCheckpoint = apps.get_model('campaigns', 'AnalyticsCheckpoint')
+    Campaign = apps.get_model('campaigns', 'Campaign')
+    CampaignApplication = apps.get_model('campaigns', 'CampaignApplication')
+    CustomOffer = apps.get_model('campaigns', 'CustomOffer')
+    InfluencerAnalytics = apps.get_model('campaigns', 'InfluencerAnalytics')
+
+    def event(kind, row, amount=None):
+        return ActivityEvent(
+            kind=kind, influencer_id=row.influencer_id, campaign_id=row.campaign_id, object_id=row.id, amount=amount,
+        )
+
+    applications = CampaignApplication.objects.order_by('applied_at', 'id')
+    events = [event(APPLIED, application) for application in _without_event(applications, ActivityEvent, APPLIED).iterator()]
+    for status, kind in APPLICATION_KINDS.items():
+        rows = _without_event(applications.filter(status=status), ActivityEvent, kind)
+        events.extend(event(kind, application) for application in rows.iterator())
+
+    offers = CustomOffer.objects.order_by('created_at', 'id')
+    events.extend(event(OFFER_SENT, offer, offer.offer_amount) for offer in _without_event(offers, ActivityEvent, OFFER_SENT).iterator())
+    for status, kind in OFFER_KINDS.items():
+        rows = _without_event(offers.filter(status=status), ActivityEvent, kind)
+        events.extend(
+            event(kind, offer, offer.offer_amount if kind == OFFER_ACCEPTED else None) for offer in rows.iterator()
+        )
+
+    ActivityEvent.objects.bulk_create(events, batch_size=500)
+
+    InfluencerAnalytics.objects.update(
+        total_applications=0, approved_applications=0, total_earnings=0, profile_views=0, last_updated=timezone.now(),
+    )
+    Campaign.objects.update(application_count=0, approved_count=0, view_count=0)
+    AnalyticsCheckpoint.objects.update_or_create(name='analytics', defaults={'last_event_id': 0})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0011_offermessage'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_events, migrations.RunPython.noop),
+    ]
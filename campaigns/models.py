@@ -26,6 +26,12 @@ class Campaign(models.Model):
     platform = models.CharField(max_length=50, choices=PLATFORM_CHOICES)
     creator = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='created_campaigns', null=True, blank=True)
     influencers = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='campaigns', blank=True)
+
+    # Counters maintained by the analytics materializer
+    application_count = models.PositiveIntegerField(default=0)
+    approved_count = models.PositiveIntegerField(default=0)
+    view_count = models.PositiveIntegerField(default=0)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -47,12 +53,18 @@ class CampaignApplication(models.Model):
     influencer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='campaign_applications')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     application_message = models.TextField(blank=True, null=True)
+    # Client-supplied key that makes resubmitting the same application form a no-op
+    idempotency_key = models.UUIDField(unique=True, null=True, blank=True, editable=False)
     applied_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ['campaign', 'influencer']
         ordering = ['-applied_at']
+        indexes = [
+            models.Index(fields=['campaign', 'status', 'applied_at'], name='application_campaign_status'),
+            models.Index(fields=['influencer', 'applied_at'], name='application_influencer'),
+        ]
 
     def __str__(self):
         return f"{self.influencer.username} - {self.campaign.title}"
@@ -92,6 +104,81 @@ class CustomOffer(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'deadline'], name='offer_status_deadline'),
+            models.Index(fields=['influencer', 'status', 'created_at'], name='offer_influencer_status'),
+            models.Index(fields=['brand', 'status', 'created_at'], name='offer_brand_status'),
+        ]
 
     def __str__(self):
         return f"Offer from {self.brand.username} to {self.influencer.username} - {self.title}"
+
+class OfferMessage(models.Model):
+    """Append-only negotiation thread entry on a custom offer"""
+    offer = models.ForeignKey(CustomOffer, on_delete=models.CASCADE, related_name='messages')
+    sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='offer_messages')
+    body = models.TextField(blank=True)
+    # Amount proposed with this message, if it is a counter-offer
+    counter_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['offer', 'created_at'], name='offer_message_thread'),
+        ]
+
+    def __str__(self):
+        return f"Message from {self.sender_id} on offer {self.offer_id}"
+
+    @property
+    def is_counter_offer(self):
+        return self.counter_amount is not None
+
+class ActivityEvent(models.Model):
+    """Append-only log of campaign activity, folded into analytics by the materializer"""
+
+    APPLIED = 1
+    APPROVED = 2
+    REJECTED = 3
+    OFFER_SENT = 4
+    OFFER_ACCEPTED = 5
+    OFFER_REJECTED = 6
+    CAMPAIGN_VIEWED = 7
+    PROFILE_VIEWED = 8
+    OFFER_EXPIRED = 9
+
+    KIND_CHOICES = [
+        (APPLIED, 'Application submitted'),
+        (APPROVED, 'Application approved'),
+        (REJECTED, 'Application rejected'),
+        (OFFER_SENT, 'Offer sent'),
+        (OFFER_ACCEPTED, 'Offer accepted'),
+        (OFFER_REJECTED, 'Offer rejected'),
+        (CAMPAIGN_VIEWED, 'Campaign viewed'),
+        (PROFILE_VIEWED, 'Profile viewed'),
+        (OFFER_EXPIRED, 'Offer expired'),
+    ]
+
+    kind = models.PositiveSmallIntegerField(choices=KIND_CHOICES)
+    influencer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='activity_events', null=True, blank=True)
+    campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name='activity_events', null=True, blank=True)
+    # Id of the application or offer the event refers to
+    object_id = models.PositiveBigIntegerField(null=True, blank=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.id}"
+
+class AnalyticsCheckpoint(models.Model):
+    """Last ActivityEvent id folded into analytics by a materializer"""
+    name = models.CharField(max_length=50, unique=True)
+    last_event_id = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_event_id}"
@@ -0,0 +1,120 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from crewup import badges, notifications
+
+from .models import ActivityEvent, CustomOffer, OfferMessage
+from . import analytics
+
+DEFAULT_BATCH_SIZE = 500
+
+# Fields copied from the validated template offer onto every bulk copy
+BULK_OFFER_FIELDS = ['title', 'description', 'offer_amount', 'deliverables', 'deadline', 'brand_message', 'campaign_id']
+
+
+def expire_overdue_batch(batch_size=DEFAULT_BATCH_SIZE, today=None):
+    """Expire the next batch of pending offers whose deadline has passed. Returns the number expired."""
+    today = today or timezone.localdate()
+
+    with transaction.atomic():
+        # Served by the (status, deadline) index
+        rows = list(
+            CustomOffer.objects.select_for_update()
+            .filter(status='pending', deadline__lt=today)
+            .order_by('deadline', 'id')
+            .values_list('id', 'influencer_id', 'campaign_id')[:batch_size]
+        )
+        if not rows:
+            return 0
+
+        CustomOffer.objects.filter(id__in=[row[0] for row in rows], status='pending').update(
+            status='expired', updated_at=timezone.now()
+        )
+        analytics.record_bulk(ActivityEvent.OFFER_EXPIRED, rows)
+
+    badges.invalidate(badges.PENDING_OFFERS, [row[1] for row in rows])
+
+    return len(rows)
+
+
+def expire_overdue_offers(batch_size=DEFAULT_BATCH_SIZE, today=None):
+    """Expire every overdue pending offer, one transaction per batch. Returns the number expired."""
+    total = 0
+    while True:
+        expired = expire_overdue_batch(batch_size, today)
+        total += expired
+        if expired < batch_size:
+            return total
+
+
+def send_bulk_offers(brand, template, influencer_ids, batch_size=DEFAULT_BATCH_SIZE):
+    """Send copies of an unsaved ``template`` offer from ``brand`` to every influencer id.
+
+    The offers and their OFFER_SENT events are inserted in batches inside one
+    transaction; e-mail notifications are queued and only go out after commit.
+    Returns the created offers.
+    """
+    values = {field: getattr(template, field) for field in BULK_OFFER_FIELDS}
+
+    with transaction.atomic():
+        offers = CustomOffer.objects.bulk_create(
+            [CustomOffer(brand=brand, influencer_id=influencer_id, **values) for influencer_id in influencer_ids],
+            batch_size=batch_size,
+        )
+        ActivityEvent.objects.bulk_create(
+            [
+                ActivityEvent(
+                    kind=ActivityEvent.OFFER_SENT,
+                    influencer_id=offer.influencer_id,
+                    campaign_id=offer.campaign_id,
+                    object_id=offer.id,
+                    amount=offer.offer_amount,
+                )
+                for offer in offers
+            ],
+            batch_size=batch_size,
+        )
+        notifications.enqueue(notify_offer_recipients, brand.username, template.title, list(influencer_ids))
+
+    badges.invalidate(badges.PENDING_OFFERS, influencer_ids)
+
+    return offers
+
+
+def notify_offer_recipients(brand_name, title, influencer_ids):
+    """E-mail each influencer that a new offer is waiting in their inbox"""
+    recipients = (
+        get_user_model().objects.filter(id__in=influencer_ids)
+        .exclude(email='')
+        .values_list('email', flat=True)
+        .iterator(chunk_size=DEFAULT_BATCH_SIZE)
+    )
+    subject = f'New offer from {brand_name}: {title}'
+    body = (
+        f'{brand_name} has sent you a custom offer, "{title}".\n\n'
+        'Log in to CrewUp and open My Offers to review it.'
+    )
+    return notifications.send_emails((subject, body, [email]) for email in recipients)
+
+
+def post_offer_message(offer, sender, body='', counter_amount=None):
+    """Append a message to an offer's negotiation thread.
+
+    A counter-offer from the brand revises the offer's terms; one from the
+    influencer is a proposal the brand can take up with its own counter-offer.
+    Returns the message, or None if a counter-offer arrived after the offer
+    stopped being pending.
+    """
+    with transaction.atomic():
+        if counter_amount is not None and sender.id == offer.brand_id:
+            revised = CustomOffer.objects.filter(id=offer.id, status='pending').update(
+                offer_amount=counter_amount, updated_at=timezone.now()
+            )
+            if not revised:
+                return None
+            offer.offer_amount = counter_amount
+        elif counter_amount is not None and offer.status != 'pending':
+            return None
+
+        return OfferMessage.objects.create(offer=offer, sender=sender, body=body, counter_amount=counter_amount)
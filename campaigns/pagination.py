@@ -0,0 +1,87 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class CursorPage:
+    """One page of keyset-paginated results"""
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def encode_cursor(timestamp, pk):
+    raw = f"{timestamp.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return ``(timestamp, pk)`` for a cursor, or None if it is missing or malformed"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def paginate_by_cursor(queryset, cursor, page_size, field):
+    """Return the page of ``queryset`` after ``cursor``, newest first by ``(field, id)``.
+
+    Unlike OFFSET pagination, each page is a bounded index range scan no matter
+    how deep the reader has scrolled.
+    """
+    queryset = queryset.order_by(f'-{field}', '-id')
+
+    position = decode_cursor(cursor)
+    if position:
+        timestamp, pk = position
+        queryset = queryset.filter(
+            Q(**{f'{field}__lt': timestamp}) | Q(**{field: timestamp, 'id__lt': pk})
+        )
+
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, field), last.id)
+    return CursorPage(items, next_cursor)
+
+
+def fetch_after_cursor(queryset, cursor, limit, field):
+    """Return up to ``limit`` rows after ``cursor``, oldest first by ``(field, id)``.
+
+    Used for incremental polling: the returned cursor points at the last row
+    handed out, or stays at ``cursor`` when nothing is new.
+    """
+    queryset = queryset.order_by(field, 'id')
+
+    position = decode_cursor(cursor)
+    if position:
+        timestamp, pk = position
+        queryset = queryset.filter(
+            Q(**{f'{field}__gt': timestamp}) | Q(**{field: timestamp, 'id__gt': pk})
+        )
+    else:
+        cursor = None
+
+    items = list(queryset[:limit])
+    if items:
+        last = items[-1]
+        cursor = encode_cursor(getattr(last, field), last.id)
+    return CursorPage(items, cursor)
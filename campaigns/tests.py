@@ -1,3 +1,622 @@
-from django.test import TestCase
+import csv
+import io
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.messages import get_messages
+from django.core import mail
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from authentication.models import CustomUser
+from crewup import badges
+from payments import entitlements
+from payments.models import Subscription
+from .models import Campaign, CampaignApplication, InfluencerAnalytics, CustomOffer, ActivityEvent, OfferMessage
+from . import analytics, offers
+
+
+class CampaignTestMixin:
+    """Shared fixtures for campaign tests"""
+
+    def setUp(self):
+        cache.clear()
+        self.brand = CustomUser.objects.create_user(
+            username='brand', email='brand@example.com', password='pass12345', user_type='brand'
+        )
+        self.influencer = CustomUser.objects.create_user(
+            username='influencer', email='influencer@example.com', password='pass12345', user_type='influencer'
+        )
+        self.campaign = Campaign.objects.create(
+            title='Summer Launch', description='Launch campaign', budget=Decimal('500.00'),
+            category='fashion', platform='instagram', creator=self.brand,
+        )
+
+    def subscribe(self, user, plan_type='pro'):
+        Subscription.objects.create(
+            user=user, stripe_subscription_id=f'sub_{user.id}', plan_name='Pro Plan', plan_type=plan_type,
+            amount=Decimal('99.00'), billing_cycle='monthly',
+        )
+
+
+class AnalyticsServiceTests(CampaignTestMixin, TestCase):
+    def test_increment_creates_row(self):
+        analytics.increment(self.influencer.id, total_applications=1)
+
+        row = InfluencerAnalytics.objects.get(influencer=self.influencer)
+        self.assertEqual(row.total_applications, 1)
+        self.assertEqual(row.approved_applications, 0)
+
+    def test_increment_updates_in_single_query(self):
+        analytics.increment(self.influencer.id, total_applications=1)
+
+        with self.assertNumQueries(1):
+            analytics.increment(self.influencer.id, total_earnings=Decimal('25.50'))
+
+        row = InfluencerAnalytics.objects.get(influencer=self.influencer)
+        self.assertEqual(row.total_applications, 1)
+        self.assertEqual(row.total_earnings, Decimal('25.50'))
+
+
+class ActivityEventTests(CampaignTestMixin, TestCase):
+    def _apply_and_accept(self):
+        self.client.force_login(self.influencer)
+        self.client.post(
+            reverse('campaigns:apply_to_campaign', args=[self.campaign.id]),
+            {'application_message': 'Pick me'},
+        )
+        offer = CustomOffer.objects.create(
+            brand=self.brand, influencer=self.influencer, title='Collab',
+            description='Post', offer_amount=Decimal('100.00'), deliverables='1 post',
+        )
+        self.client.post(reverse('campaigns:accept_offer', args=[offer.id]), {'offer_amount': '100.00'})
+
+        application = CampaignApplication.objects.get(campaign=self.campaign, influencer=self.influencer)
+        self.client.force_login(self.brand)
+        self.client.post(reverse('campaigns:approve_application', args=[application.id]))
+        # A repeated approval must not be counted twice
+        self.client.post(reverse('campaigns:approve_application', args=[application.id]))
+
+    def test_views_only_append_events(self):
+        self._apply_and_accept()
+
+        kinds = list(ActivityEvent.objects.values_list('kind', flat=True))
+        self.assertEqual(kinds, [ActivityEvent.APPLIED, ActivityEvent.OFFER_ACCEPTED, ActivityEvent.APPROVED])
+        self.assertFalse(InfluencerAnalytics.objects.filter(influencer=self.influencer).exists())
+
+    def test_materialize_folds_events_from_checkpoint(self):
+        self._apply_and_accept()
+        later = timezone.now() + timedelta(minutes=1)
+
+        self.assertEqual(analytics.materialize(batch_size=2, now=later), 3)
+        self.assertEqual(analytics.materialize(now=later), 0)
+
+        row = InfluencerAnalytics.objects.get(influencer=self.influencer)
+        self.assertEqual(row.total_applications, 1)
+        self.assertEqual(row.approved_applications, 1)
+        self.assertEqual(row.total_earnings, Decimal('100.00'))
+
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.application_count, 1)
+        self.assertEqual(self.campaign.approved_count, 1)
+
+    def test_recent_events_wait_for_the_safety_lag(self):
+        self._apply_and_accept()
+        # A lower id that commits late must not be skipped, so the newest events stay unfolded
+        ActivityEvent.objects.filter(kind=ActivityEvent.OFFER_ACCEPTED).update(created_at=timezone.now() - timedelta(minutes=5))
+        ActivityEvent.objects.filter(kind=ActivityEvent.APPLIED).update(created_at=timezone.now() - timedelta(minutes=5))
+
+        self.assertEqual(analytics.materialize(), 2)
+        self.assertEqual(analytics.materialize(now=timezone.now() + timedelta(minutes=1)), 1)
+
+    def test_rebuild_is_deterministic(self):
+        self._apply_and_accept()
+        later = timezone.now() + timedelta(minutes=1)
+        analytics.materialize(now=later)
+        InfluencerAnalytics.objects.filter(influencer=self.influencer).update(total_applications=42)
+
+        analytics.rebuild(now=later)
+
+        row = InfluencerAnalytics.objects.get(influencer=self.influencer)
+        self.assertEqual(row.total_applications, 1)
+        self.assertEqual(row.total_earnings, Decimal('100.00'))
+
+
+class ReconcileAnalyticsTests(CampaignTestMixin, TestCase):
+    def test_reconcile_rebuilds_drifted_totals(self):
+        other = CustomUser.objects.create_user(username='other', password='pass12345', user_type='influencer')
+        CampaignApplication.objects.create(campaign=self.campaign, influencer=self.influencer, status='approved')
+        CampaignApplication.objects.create(campaign=self.campaign, influencer=other)
+        CustomOffer.objects.create(
+            brand=self.brand, influencer=self.influencer, title='Collab', description='Post',
+            offer_amount=Decimal('80.00'), deliverables='1 post', status='accepted',
+        )
+        InfluencerAnalytics.objects.create(influencer=self.influencer, total_applications=7, approved_applications=5, profile_views=3)
+        analytics.record_approval(CampaignApplication.objects.get(influencer=self.influencer))
+
+        self.assertEqual(analytics.reconcile(chunk_size=1), (2, 1, 3))
+
+        row = InfluencerAnalytics.objects.get(influencer=self.influencer)
+        # The approval event hasn't been folded yet, so it is left for the materializer
+        self.assertEqual((row.total_applications, row.approved_applications), (1, 0))
+        self.assertEqual(row.total_earnings, Decimal('80.00'))
+        self.assertEqual(row.profile_views, 3)
+        self.assertEqual(InfluencerAnalytics.objects.get(influencer=other).total_applications, 1)
+        self.campaign.refresh_from_db()
+        self.assertEqual((self.campaign.application_count, self.campaign.approved_count), (2, 0))
+
+        self.assertEqual(analytics.materialize(now=timezone.now() + timedelta(minutes=1)), 1)
+        row.refresh_from_db()
+        self.assertEqual(row.approved_applications, 1)
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.approved_count, 1)
+
+    def test_reconcile_leaves_the_checkpoint_alone(self):
+        CampaignApplication.objects.create(campaign=self.campaign, influencer=self.influencer)
+        analytics.record_campaign_view(self.campaign.id)
+        ActivityEvent.objects.update(created_at=timezone.now() - timedelta(minutes=5))
+
+        analytics.reconcile()
+
+        # Settled events are folded before the recount instead of being skipped
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.view_count, 1)
+        self.assertEqual(analytics.materialize(now=timezone.now() + timedelta(minutes=1)), 0)
+
+
+class BulkApplicationTests(CampaignTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.applications = [
+            CampaignApplication.objects.create(
+                campaign=self.campaign,
+                influencer=CustomUser.objects.create_user(username=f'creator{i}', password='pass12345', user_type='influencer'),
+            )
+            for i in range(3)
+        ]
+        self.client.force_login(self.brand)
+        self.url = reverse('campaigns:bulk_update_applications', args=[self.campaign.id])
+
+    def test_bulk_approve_selected(self):
+        selected = [str(app.id) for app in self.applications[:2]]
+        self.client.post(self.url, {'action': 'approve', 'application_ids': selected})
+
+        statuses = list(CampaignApplication.objects.order_by('id').values_list('status', flat=True))
+        self.assertEqual(statuses, ['approved', 'approved', 'pending'])
+        self.assertEqual(ActivityEvent.objects.filter(kind=ActivityEvent.APPROVED).count(), 2)
+
+    def test_bulk_reject_all_pending_skips_processed(self):
+        CampaignApplication.objects.filter(id=self.applications[0].id).update(status='approved')
+
+        self.client.post(self.url, {'action': 'reject', 'select_all': '1'})
+
+        statuses = list(CampaignApplication.objects.order_by('id').values_list('status', flat=True))
+        self.assertEqual(statuses, ['approved', 'rejected', 'rejected'])
+        self.assertEqual(ActivityEvent.objects.filter(kind=ActivityEvent.REJECTED).count(), 2)
+
+    def test_other_brand_cannot_bulk_update(self):
+        other = CustomUser.objects.create_user(username='rival', password='pass12345', user_type='brand')
+        self.client.force_login(other)
+
+        self.client.post(self.url, {'action': 'approve', 'select_all': '1'})
+
+        self.assertFalse(CampaignApplication.objects.exclude(status='pending').exists())
+
+
+class ApplyToCampaignTests(CampaignTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.influencer)
+        self.url = reverse('campaigns:apply_to_campaign', args=[self.campaign.id])
+
+    def test_apply_is_one_transaction_of_inserts(self):
+        # session + user + campaign, then savepoint/INSERT x3/release
+        with self.assertNumQueries(8):
+            self.client.post(self.url, {'application_message': 'Hi', 'idempotency_key': str(uuid.uuid4())})
+
+        self.assertTrue(self.campaign.influencers.filter(id=self.influencer.id).exists())
+        self.assertEqual(ActivityEvent.objects.filter(kind=ActivityEvent.APPLIED).count(), 1)
+
+    def test_retry_with_same_idempotency_key_is_silent(self):
+        data = {'application_message': 'Hi', 'idempotency_key': str(uuid.uuid4())}
+        self.client.post(self.url, data)
+        response = self.client.post(self.url, data)
+
+        self.assertEqual(CampaignApplication.objects.count(), 1)
+        self.assertEqual(list(get_messages(response.wsgi_request)), [])
+
+    def test_second_application_is_rejected(self):
+        self.client.post(self.url, {'application_message': 'Hi', 'idempotency_key': str(uuid.uuid4())})
+        response = self.client.post(self.url, {'application_message': 'Again', 'idempotency_key': str(uuid.uuid4())})
+
+        self.assertEqual(CampaignApplication.objects.count(), 1)
+        self.assertEqual(
+            [str(message) for message in get_messages(response.wsgi_request)],
+            ['You have already applied to this campaign.'],
+        )
+
+
+class ConcurrentApplyTests(CampaignTestMixin, TransactionTestCase):
+    def test_parallel_applies_create_one_application(self):
+        url = reverse('campaigns:apply_to_campaign', args=[self.campaign.id])
+        key = str(uuid.uuid4())
+
+        def apply(index):
+            client = Client()
+            client.force_login(self.influencer)
+            try:
+                return client.post(url, {'application_message': f'Try {index}', 'idempotency_key': key}).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            status_codes = list(pool.map(apply, range(16)))
+
+        self.assertEqual(set(status_codes), {302})
+        self.assertEqual(CampaignApplication.objects.filter(campaign=self.campaign).count(), 1)
+        self.assertEqual(self.campaign.influencers.count(), 1)
+        self.assertEqual(ActivityEvent.objects.filter(kind=ActivityEvent.APPLIED).count(), 1)
+
+
+class BrandCampaignApplicationsTests(CampaignTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(25):
+            CampaignApplication.objects.create(
+                campaign=self.campaign,
+                influencer=CustomUser.objects.create_user(username=f'applicant{i}', user_type='influencer'),
+                status='approved' if i % 5 == 0 else 'pending',
+            )
+        self.client.force_login(self.brand)
+        self.url = reverse('campaigns:brand_campaign_applications', args=[self.campaign.id])
+
+    def test_cursor_pages_cover_all_applications_once(self):
+        response = self.client.get(self.url)
+        first = response.context['applications']
+        self.assertEqual(len(first), 20)
+        self.assertEqual(response.context['total_applications'], 25)
+        self.assertIn(('approved', 'Approved', 5), response.context['status_tabs'])
+
+        response = self.client.get(self.url, {'cursor': first.next_cursor})
+        second = response.context['applications']
+        self.assertEqual(len(second), 5)
+        self.assertFalse(second.has_next)
+        self.assertEqual(len({app.id for app in first} | {app.id for app in second}), 25)
+
+    def test_status_filter(self):
+        response = self.client.get(self.url, {'status': 'approved'})
+
+        self.assertEqual({app.status for app in response.context['applications']}, {'approved'})
+        self.assertEqual(len(response.context['applications']), 5)
+
+
+class ExportTests(CampaignTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.influencer.instagram_handle = '@creator'
+        self.influencer.followers_count = 1200
+        self.influencer.save()
+        CampaignApplication.objects.create(
+            campaign=self.campaign, influencer=self.influencer, application_message='=HYPERLINK("x") & <tags>',
+        )
+        self.subscribe(self.brand)
+        self.client.force_login(self.brand)
+
+    def test_csv_export_streams_rows(self):
+        response = self.client.get(reverse('campaigns:export_campaign_applications', args=[self.campaign.id, 'csv']))
+
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0][0], 'Username')
+        self.assertEqual(rows[1][:5], ['influencer', 'influencer@example.com', '1200', 'Instagram', 'Pending'])
+        self.assertTrue(rows[1][5].startswith("'="))
+
+    def test_csv_export_escapes_tab_and_carriage_return_prefixes(self):
+        CampaignApplication.objects.filter(influencer=self.influencer).update(application_message='\t=1+1')
+
+        response = self.client.get(reverse('campaigns:export_campaign_applications', args=[self.campaign.id, 'csv']))
+
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[1][5], "'\t=1+1")
+
+    def test_xlsx_export_is_a_valid_workbook(self):
+        CustomOffer.objects.create(
+            brand=self.brand, influencer=self.influencer, campaign=self.campaign, title='Collab',
+            description='Post', offer_amount=Decimal('100.00'), deliverables='1 post',
+        )
+        response = self.client.get(reverse('campaigns:export_offers', args=['xlsx']))
+
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        self.assertIn('Summer Launch', sheet)
+        self.assertIn('<v>100.00</v>', sheet)
+
+    def test_unknown_format_is_404(self):
+        response = self.client.get(reverse('campaigns:export_offers', args=['pdf']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_export_requires_subscription(self):
+        Subscription.objects.filter(user=self.brand).update(status='cancelled')
+        cache.clear()
+
+        response = self.client.get(reverse('campaigns:export_offers', args=['csv']))
+
+        self.assertRedirects(response, reverse('pricing'), fetch_redirect_response=False)
+
+
+class MyApplicationsTests(CampaignTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(22):
+            campaign = Campaign.objects.create(
+                title=f'Campaign {i}', description='Desc', budget=Decimal('100.00'),
+                category='tech', platform='youtube', creator=self.brand,
+            )
+            CampaignApplication.objects.create(
+                campaign=campaign, influencer=self.influencer, status='rejected' if i < 2 else 'pending',
+            )
+        self.client.force_login(self.influencer)
+        self.url = reverse('campaigns:my_applications')
+
+    def test_inbox_is_paginated_without_per_row_queries(self):
+        badges.get_badges(self.influencer)
+
+        # session + user + grouped count + page query; nav badges come from the cache
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+
+        self.assertEqual(len(response.context['applications']), 20)
+        self.assertTrue(response.context['applications'].has_next)
+        self.assertEqual(response.context['total_applications'], 22)
+
+    def test_status_tab(self):
+        response = self.client.get(self.url, {'status': 'rejected'})
+
+        self.assertEqual(len(response.context['applications']), 2)
+        self.assertIn(('rejected', 'Rejected', 2), response.context['status_tabs'])
+
+
+class OfferExpiryTests(CampaignTestMixin, TestCase):
+    def _offer(self, deadline, status='pending'):
+        return CustomOffer.objects.create(
+            brand=self.brand, influencer=self.influencer, title='Collab', description='Post',
+            offer_amount=Decimal('50.00'), deliverables='1 post', deadline=deadline, status=status,
+        )
+
+    def test_expires_only_overdue_pending_offers_in_batches(self):
+        today = timezone.localdate()
+        overdue = [self._offer(today - timedelta(days=i)) for i in range(1, 4)]
+        due_today = self._offer(today)
+        accepted = self._offer(today - timedelta(days=5), status='accepted')
+        no_deadline = self._offer(None)
+
+        self.assertEqual(offers.expire_overdue_offers(batch_size=2), 3)
+
+        self.assertEqual(CustomOffer.objects.filter(id__in=[o.id for o in overdue], status='expired').count(), 3)
+        for offer, status in ((due_today, 'pending'), (accepted, 'accepted'), (no_deadline, 'pending')):
+            offer.refresh_from_db()
+            self.assertEqual(offer.status, status)
+        self.assertEqual(ActivityEvent.objects.filter(kind=ActivityEvent.OFFER_EXPIRED).count(), 3)
+
+    def test_expiry_events_keep_the_offer_campaign(self):
+        offer = self._offer(timezone.localdate() - timedelta(days=1))
+        CustomOffer.objects.filter(id=offer.id).update(campaign=self.campaign)
+
+        offers.expire_overdue_offers()
+
+        event = ActivityEvent.objects.get(kind=ActivityEvent.OFFER_EXPIRED)
+        self.assertEqual((event.object_id, event.campaign_id), (offer.id, self.campaign.id))
+
+    def test_expired_offer_cannot_be_accepted_and_is_hidden(self):
+        offer = self._offer(timezone.localdate() - timedelta(days=1))
+        offers.expire_overdue_offers()
+        self.client.force_login(self.influencer)
+
+        self.client.post(reverse('campaigns:accept_offer', args=[offer.id]), {'offer_amount': '50.00'})
+        response = self.client.get(reverse('campaigns:my_offers'))
+
+        offer.refresh_from_db()
+        self.assertEqual(offer.status, 'expired')
+        self.assertNotIn(offer, list(response.context['offers']))
+
+
+class OfferInboxTests(CampaignTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(23):
+            CustomOffer.objects.create(
+                brand=self.brand, influencer=self.influencer, campaign=self.campaign, title=f'Offer {i}',
+                description='Post', offer_amount=Decimal('10.00'), deliverables='1 post',
+                status='expired' if i < 3 else 'pending',
+            )
+        self.url = reverse('campaigns:my_offers')
+
+    def test_brand_inbox_is_paginated_with_joined_parties(self):
+        self.client.force_login(self.brand)
+        badges.get_badges(self.brand)
+        entitlements.get_entitlements(self.brand)
+
+        # session + user + facet counts + page query; nav badges and entitlements come from the cache
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+            [str(offer) for offer in response.context['offers']]
+
+        self.assertEqual(len(response.context['offers']), 20)
+        self.assertEqual(response.context['total_offers'], 20)
+        self.assertFalse(response.context['offers'].has_next)
+
+    def test_influencer_expired_tab(self):
+        self.client.force_login(self.influencer)
+
+        response = self.client.get(self.url, {'status': 'expired'})
+
+        self.assertEqual(len(response.context['offers']), 3)
+        self.assertIn(('expired', 'Expired', 3), response.context['status_tabs'])
+
+
+@override_settings(NOTIFICATIONS_ASYNC=False, EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class BulkOfferTests(CampaignTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.influencers = [self.influencer] + [
+            CustomUser.objects.create_user(
+                username=f'creator{i}', email=f'creator{i}@example.com', user_type='influencer'
+            )
+            for i in range(4)
+        ]
+        self.subscribe(self.brand)
+        self.url = reverse('campaigns:bulk_send_offer')
+        self.data = {
+            'title': 'Autumn drop', 'description': 'Two posts', 'offer_amount': '150.00',
+            'deliverables': '2 posts', 'campaign': self.campaign.id,
+            'influencer_ids': [influencer.id for influencer in self.influencers] + [self.brand.id],
+        }
+
+    def test_sends_one_offer_per_influencer(self):
+        self.client.force_login(self.brand)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, self.data)
+
+        self.assertRedirects(response, reverse('campaigns:offer_sent_success'))
+        offers = CustomOffer.objects.filter(brand=self.brand, title='Autumn drop')
+        self.assertEqual(
+            set(offers.values_list('influencer_id', flat=True)),
+            {influencer.id for influencer in self.influencers},
+        )
+        self.assertEqual(
+            ActivityEvent.objects.filter(kind=ActivityEvent.OFFER_SENT, object_id__in=offers.values('id')).count(), 5
+        )
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_selection_is_posted_from_the_search_page(self):
+        self.client.force_login(self.brand)
+
+        response = self.client.post(self.url, {'step': 'select', 'influencer_ids': self.data['influencer_ids']})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['influencers']), 5)
+        self.assertFalse(response.context['form'].is_bound)
+        self.assertFalse(CustomOffer.objects.exists())
+
+    @override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend', EMAIL_PORT=1)
+    def test_mail_failures_are_logged(self):
+        from crewup import notifications
+
+        with self.assertLogs('crewup.notifications', 'ERROR'):
+            notifications._run(notifications.send_emails, ([('Hi', 'Body', ['a@example.com'])],), {})
+
+    def test_invalid_offer_creates_nothing(self):
+        self.client.force_login(self.brand)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, {**self.data, 'offer_amount': ''})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(CustomOffer.objects.exists())
+        self.assertEqual(len(mail.outbox), 0)
+
+
+class BadgeCountTests(CampaignTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.application = CampaignApplication.objects.create(campaign=self.campaign, influencer=self.influencer)
+
+    def test_counts_are_read_from_cache_once_warm(self):
+        self.assertEqual(badges.get_badges(self.brand), {badges.PENDING_APPLICATIONS: 1})
+
+        with self.assertNumQueries(0):
+            self.assertEqual(badges.get_badges(self.brand), {badges.PENDING_APPLICATIONS: 1})
+
+    def test_state_changes_update_counters(self):
+        badges.get_badges(self.brand)
+        badges.get_badges(self.influencer)
+        self.client.force_login(self.brand)
+
+        self.client.post(reverse('campaigns:approve_application', args=[self.application.id]))
+        self.client.post(reverse('campaigns:send_custom_offer', args=[self.influencer.id]), {
+            'title': 'Collab', 'description': 'Post', 'offer_amount': '50.00', 'deliverables': '1 post',
+        })
+
+        with self.assertNumQueries(0):
+            self.assertEqual(badges.get_badges(self.brand), {badges.PENDING_APPLICATIONS: 0})
+            self.assertEqual(badges.get_badges(self.influencer), {badges.PENDING_OFFERS: 1})
+
+
+class OfferNegotiationTests(CampaignTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.offer = CustomOffer.objects.create(
+            brand=self.brand, influencer=self.influencer, title='Collab', description='Post',
+            offer_amount=Decimal('100.00'), deliverables='1 post',
+        )
+        self.post_url = reverse('campaigns:send_offer_message', args=[self.offer.id])
+        self.since_url = reverse('campaigns:offer_messages_since', args=[self.offer.id])
+
+    def test_brand_counter_offer_revises_terms(self):
+        self.client.force_login(self.influencer)
+        self.client.post(self.post_url, {'body': 'Could you do 150?', 'counter_amount': '150.00'})
+        self.offer.refresh_from_db()
+        self.assertEqual(self.offer.offer_amount, Decimal('100.00'))
+
+        self.client.force_login(self.brand)
+        self.client.post(self.post_url, {'body': 'Meet at 125', 'counter_amount': '125.00'})
+        self.offer.refresh_from_db()
+        self.assertEqual(self.offer.offer_amount, Decimal('125.00'))
+        self.assertEqual(self.offer.messages.count(), 2)
+
+        response = self.client.get(reverse('campaigns:offer_detail', args=[self.offer.id]))
+        self.assertContains(response, 'Counter-offer: $125.00')
+
+    def test_accept_pins_the_amount_the_influencer_saw(self):
+        self.client.force_login(self.brand)
+        self.client.post(self.post_url, {'counter_amount': '60.00'})
+        self.client.force_login(self.influencer)
+
+        self.client.post(reverse('campaigns:accept_offer', args=[self.offer.id]), {'offer_amount': '100.00'})
+        self.offer.refresh_from_db()
+        self.assertEqual(self.offer.status, 'pending')
+
+        response = self.client.get(reverse('campaigns:offer_detail', args=[self.offer.id]))
+        self.assertContains(response, 'name="offer_amount" value="60.00"')
+        self.client.post(reverse('campaigns:accept_offer', args=[self.offer.id]), {'offer_amount': '60.00'})
+        self.offer.refresh_from_db()
+        self.assertEqual(self.offer.status, 'accepted')
+        event = ActivityEvent.objects.get(kind=ActivityEvent.OFFER_ACCEPTED)
+        self.assertEqual(event.amount, Decimal('60.00'))
+
+    def test_no_counter_offer_once_processed(self):
+        CustomOffer.objects.filter(id=self.offer.id).update(status='accepted')
+        self.client.force_login(self.brand)
+
+        self.client.post(self.post_url, {'counter_amount': '10.00'})
+
+        self.assertFalse(OfferMessage.objects.exists())
+
+    def test_since_returns_only_new_messages(self):
+        first = OfferMessage.objects.create(offer=self.offer, sender=self.brand, body='Hi')
+        self.client.force_login(self.influencer)
+
+        data = self.client.get(self.since_url).json()
+        self.assertEqual([message['id'] for message in data['messages']], [first.id])
+
+        second = OfferMessage.objects.create(offer=self.offer, sender=self.influencer, body='Hello')
+        data = self.client.get(self.since_url, {'cursor': data['cursor']}).json()
+        self.assertEqual([message['id'] for message in data['messages']], [second.id])
+        self.assertTrue(data['messages'][0]['mine'])
+
+        data = self.client.get(self.since_url, {'cursor': data['cursor']}).json()
+        self.assertEqual(data['messages'], [])
+        self.assertIsNotNone(data['cursor'])
+
+    def test_thread_hidden_from_other_users(self):
+        self.client.force_login(CustomUser.objects.create_user(username='other', user_type='influencer'))
+
+        self.assertEqual(self.client.get(self.since_url).status_code, 404)
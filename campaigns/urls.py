@@ -19,11 +19,17 @@ urlpatterns = [
     path('applications/<int:application_id>/approve/', views.approve_application, name='approve_application'),
     path('applications/<int:application_id>/reject/', views.reject_application, name='reject_application'),
     path('campaign/<int:campaign_id>/applications/', views.brand_campaign_applications, name='brand_campaign_applications'),
+    path('campaign/<int:campaign_id>/applications/bulk/', views.bulk_update_applications, name='bulk_update_applications'),
+    path('campaign/<int:campaign_id>/applications/export/<str:export_format>/', views.export_campaign_applications, name='export_campaign_applications'),
 
     # Custom Offer URLs
     path('send-offer/<int:influencer_id>/', views.send_custom_offer, name='send_custom_offer'),
+    path('send-offer/bulk/', views.bulk_send_offer, name='bulk_send_offer'),
     path('my-offers/', views.my_offers, name='my_offers'),
+    path('my-offers/export/<str:export_format>/', views.export_offers, name='export_offers'),
     path('offer/<int:offer_id>/', views.offer_detail, name='offer_detail'),
+    path('offer/<int:offer_id>/messages/', views.send_offer_message, name='send_offer_message'),
+    path('offer/<int:offer_id>/messages/since/', views.offer_messages_since, name='offer_messages_since'),
     path('offer/<int:offer_id>/accept/', views.accept_offer, name='accept_offer'),
     path('offer/<int:offer_id>/reject/', views.reject_offer, name='reject_offer'),
     path('offer-sent-success/', views.offer_sent_success, name='offer_sent_success'),
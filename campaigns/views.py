@@ -1,12 +1,37 @@
+import uuid
+from decimal import Decimal, InvalidOperation
 
 from django.shortcuts import render, get_object_or_404, redirect
+from django.http import Http404, JsonResponse
 from django.core.paginator import Paginator
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db import IntegrityError
-from .models import Campaign, CampaignApplication, InfluencerAnalytics, CustomOffer
-from .forms import CampaignForm, CampaignApplicationForm, CustomOfferForm
+from django.db import IntegrityError, transaction
+from django.db.models import Count
+from django.utils import timezone
+from django.views.decorators.http import require_POST
+from .models import Campaign, CampaignApplication, InfluencerAnalytics, CustomOffer, ActivityEvent
+from .forms import CampaignForm, CampaignApplicationForm, CustomOfferForm, OfferMessageForm
+from . import analytics as analytics_service
+from . import exports
+from .offers import post_offer_message, send_bulk_offers
+from .pagination import encode_cursor, fetch_after_cursor, paginate_by_cursor
 from authentication.models import CustomUser
+from crewup import badges as badge_service
+from payments import entitlements
+
+APPLICATIONS_PER_PAGE = 20
+OFFERS_PER_PAGE = 20
+OFFER_MESSAGES_PER_PAGE = 50
+EXPORT_CHUNK_SIZE = 2000
+MAX_BULK_OFFER_RECIPIENTS = 1000
+
+def _status_counts(queryset):
+    """Count rows per status in one grouped query"""
+    return dict(queryset.order_by().values_list('status').annotate(total=Count('id')))
+
+def _status_tabs(status_counts, choices):
+    return [(value, label, status_counts.get(value, 0)) for value, label in choices]
 
 def campaign_list(request):
     # Get all campaigns
@@ -61,6 +86,7 @@ def campaign_list(request):
 
 def campaign_detail(request, campaign_id):
     campaign = get_object_or_404(Campaign, id=campaign_id)
+    analytics_service.record_campaign_view(campaign.id)
     return render(request, 'campaigns/campaign_detail.html', {'campaign': campaign})
 
 @login_required
@@ -120,7 +146,13 @@ def campaign_delete(request, campaign_id):
         return redirect('campaigns:campaign_detail', campaign_id=campaign.id)
 
     if request.method == 'POST':
+        # Pending offers tied to the campaign are deleted with it
+        offer_recipients = list(
+            campaign.custom_offers.filter(status='pending').values_list('influencer_id', flat=True)
+        )
         campaign.delete()
+        badge_service.invalidate(badge_service.PENDING_APPLICATIONS, [campaign.creator_id])
+        badge_service.invalidate(badge_service.PENDING_OFFERS, offer_recipients)
         messages.success(request, 'Campaign deleted successfully!')
         return redirect('campaigns:campaign_list')
     return render(request, 'campaigns/campaign_detail.html', {'campaign': campaign})
@@ -136,37 +168,45 @@ def apply_to_campaign(request, campaign_id):
         messages.error(request, 'Only influencer users can apply to campaigns.')
         return redirect('campaigns:campaign_detail', campaign_id=campaign.id)
 
-    # Check if already applied
-    if CampaignApplication.objects.filter(campaign=campaign, influencer=request.user).exists():
-        messages.warning(request, 'You have already applied to this campaign.')
-        return redirect('campaigns:campaign_detail', campaign_id=campaign.id)
-
     if request.method == 'POST':
         form = CampaignApplicationForm(request.POST)
         if form.is_valid():
+            idempotency_key = form.cleaned_data['idempotency_key']
             try:
-                application = form.save(commit=False)
-                application.campaign = campaign
-                application.influencer = request.user
-                application.save()
-
-                # Add influencer to campaign's influencers list
-                campaign.influencers.add(request.user)
-
-                # Update analytics
-                analytics, created = InfluencerAnalytics.objects.get_or_create(
-                    influencer=request.user,
-                    defaults={'total_applications': 0, 'approved_applications': 0, 'total_earnings': 0, 'profile_views': 0}
-                )
-                analytics.total_applications += 1
-                analytics.save()
-
+                # No pre-check: the (campaign, influencer) unique constraint rejects duplicates,
+                # so an application costs three INSERTs in one transaction
+                with transaction.atomic():
+                    application = form.save(commit=False)
+                    application.campaign = campaign
+                    application.influencer = request.user
+                    application.idempotency_key = idempotency_key
+                    application.save()
+
+                    # Add influencer to campaign's influencers list without add()'s extra SELECT
+                    Campaign.influencers.through.objects.bulk_create(
+                        [Campaign.influencers.through(campaign_id=campaign.id, customuser_id=request.user.id)],
+                        ignore_conflicts=True,
+                    )
+
+                    # Update analytics
+                    analytics_service.record_application(application)
+
+                badge_service.adjust(badge_service.PENDING_APPLICATIONS, 1, campaign.creator_id)
                 return redirect('campaigns:campaign_detail', campaign_id=campaign.id)
             except IntegrityError:
-                messages.warning(request, 'You have already applied to this campaign.')
+                # A retried submission of the same form is not an error
+                if not (idempotency_key and CampaignApplication.objects.filter(
+                    idempotency_key=idempotency_key, influencer=request.user
+                ).exists()):
+                    messages.warning(request, 'You have already applied to this campaign.')
                 return redirect('campaigns:campaign_detail', campaign_id=campaign.id)
     else:
-        form = CampaignApplicationForm()
+        # Check if already applied
+        if CampaignApplication.objects.filter(campaign=campaign, influencer=request.user).exists():
+            messages.warning(request, 'You have already applied to this campaign.')
+            return redirect('campaigns:campaign_detail', campaign_id=campaign.id)
+
+        form = CampaignApplicationForm(initial={'idempotency_key': uuid.uuid4()})
 
     return render(request, 'campaigns/apply_to_campaign.html', {'form': form, 'campaign': campaign})
 
@@ -177,8 +217,28 @@ def my_applications(request):
         messages.error(request, 'Only influencer users can view applications.')
         return redirect('home')
 
-    applications = CampaignApplication.objects.filter(influencer=request.user).order_by('-applied_at')
-    return render(request, 'campaigns/my_applications.html', {'applications': applications})
+    # Per-status counts in one grouped query
+    status_counts = _status_counts(CampaignApplication.objects.filter(influencer=request.user))
+
+    applications = CampaignApplication.objects.filter(influencer=request.user).select_related('campaign__creator')
+
+    # Apply status filter
+    status_filter = request.GET.get('status', '')
+    if status_filter in dict(CampaignApplication.STATUS_CHOICES):
+        applications = applications.filter(status=status_filter)
+    else:
+        status_filter = ''
+
+    # Cursor pagination
+    page = paginate_by_cursor(applications, request.GET.get('cursor'), APPLICATIONS_PER_PAGE, 'applied_at')
+
+    context = {
+        'applications': page,
+        'status_filter': status_filter,
+        'status_tabs': _status_tabs(status_counts, CampaignApplication.STATUS_CHOICES),
+        'total_applications': sum(status_counts.values()),
+    }
+    return render(request, 'campaigns/my_applications.html', context)
 
 @login_required
 def influencer_analytics(request):
@@ -217,18 +277,17 @@ def approve_application(request, application_id):
         return redirect('campaigns:campaign_detail', campaign_id=application.campaign.id)
 
     if request.method == 'POST':
-        application.status = 'approved'
-        application.save()
-
-        # Update influencer analytics
-        analytics, created = InfluencerAnalytics.objects.get_or_create(
-            influencer=application.influencer,
-            defaults={'total_applications': 0, 'approved_applications': 0, 'total_earnings': 0, 'profile_views': 0}
-        )
-        analytics.approved_applications += 1
-        analytics.save()
-
-        messages.success(request, f'Application from {application.influencer.username} has been approved!')
+        with transaction.atomic():
+            # Only pending applications can be approved, so repeat POSTs are no-ops
+            approved = CampaignApplication.objects.filter(id=application.id, status='pending').update(status='approved', updated_at=timezone.now())
+            if approved:
+                analytics_service.record_approval(application)
+
+        if approved:
+            badge_service.adjust(badge_service.PENDING_APPLICATIONS, -1, application.campaign.creator_id)
+            messages.success(request, f'Application from {application.influencer.username} has been approved!')
+        else:
+            messages.warning(request, 'This application has already been processed.')
 
     return redirect('campaigns:campaign_detail', campaign_id=application.campaign.id)
 
@@ -248,10 +307,17 @@ def reject_application(request, application_id):
         return redirect('campaigns:campaign_detail', campaign_id=application.campaign.id)
 
     if request.method == 'POST':
-        application.status = 'rejected'
-        application.save()
-
-        messages.success(request, f'Application from {application.influencer.username} has been rejected.')
+        with transaction.atomic():
+            # Only pending applications can be rejected, so repeat POSTs are no-ops
+            rejected = CampaignApplication.objects.filter(id=application.id, status='pending').update(status='rejected', updated_at=timezone.now())
+            if rejected:
+                analytics_service.record_rejection(application)
+
+        if rejected:
+            badge_service.adjust(badge_service.PENDING_APPLICATIONS, -1, application.campaign.creator_id)
+            messages.success(request, f'Application from {application.influencer.username} has been rejected.')
+        else:
+            messages.warning(request, 'This application has already been processed.')
 
     return redirect('campaigns:campaign_detail', campaign_id=application.campaign.id)
 
@@ -266,18 +332,113 @@ def brand_campaign_applications(request, campaign_id):
         return redirect('campaigns:campaign_detail', campaign_id=campaign.id)
 
     # If user is a brand, check if they are the campaign creator
-    if request.user.user_type == 'brand' and campaign.creator != request.user:
+    if request.user.user_type == 'brand' and campaign.creator_id != request.user.id:
         messages.error(request, 'You can only view applications for your own campaigns.')
         return redirect('campaigns:campaign_detail', campaign_id=campaign.id)
 
-    applications = CampaignApplication.objects.filter(campaign=campaign).order_by('-applied_at')
+    # Per-status counts in one grouped query
+    status_counts = _status_counts(CampaignApplication.objects.filter(campaign=campaign))
+
+    applications = CampaignApplication.objects.filter(campaign=campaign).select_related('influencer')
+
+    # Apply status filter
+    status_filter = request.GET.get('status', '')
+    if status_filter in dict(CampaignApplication.STATUS_CHOICES):
+        applications = applications.filter(status=status_filter)
+    else:
+        status_filter = ''
+
+    # Cursor pagination
+    page = paginate_by_cursor(applications, request.GET.get('cursor'), APPLICATIONS_PER_PAGE, 'applied_at')
 
     context = {
         'campaign': campaign,
-        'applications': applications,
+        'applications': page,
+        'status_filter': status_filter,
+        'status_tabs': _status_tabs(status_counts, CampaignApplication.STATUS_CHOICES),
+        'total_applications': sum(status_counts.values()),
     }
     return render(request, 'campaigns/campaign_applications.html', context)
 
+@login_required
+@require_POST
+def bulk_update_applications(request, campaign_id):
+    """Approve or reject many pending applications for a campaign at once"""
+    campaign = get_object_or_404(Campaign, id=campaign_id)
+
+    # Only the campaign creator or admin can manage applications
+    if request.user.user_type not in ['brand', 'admin']:
+        messages.error(request, 'Only brand users or admins can manage applications.')
+        return redirect('campaigns:campaign_detail', campaign_id=campaign.id)
+
+    # If user is a brand, check if they are the campaign creator
+    if request.user.user_type == 'brand' and campaign.creator_id != request.user.id:
+        messages.error(request, 'You can only manage applications for your own campaigns.')
+        return redirect('campaigns:campaign_detail', campaign_id=campaign.id)
+
+    transitions = {
+        'approve': ('approved', ActivityEvent.APPROVED),
+        'reject': ('rejected', ActivityEvent.REJECTED),
+    }
+    action = request.POST.get('action')
+    if action not in transitions:
+        messages.error(request, 'Invalid bulk action.')
+        return redirect('campaigns:brand_campaign_applications', campaign_id=campaign.id)
+    new_status, event_kind = transitions[action]
+
+    # Only pending applications can change state
+    applications = CampaignApplication.objects.filter(campaign=campaign, status='pending')
+    if not request.POST.get('select_all'):
+        application_ids = [value for value in request.POST.getlist('application_ids') if value.isdigit()]
+        applications = applications.filter(id__in=application_ids)
+
+    with transaction.atomic():
+        rows = list(applications.select_for_update().values_list('id', 'influencer_id'))
+        if rows:
+            CampaignApplication.objects.filter(id__in=[row[0] for row in rows], status='pending').update(
+                status=new_status, updated_at=timezone.now()
+            )
+            analytics_service.record_bulk(event_kind, rows, campaign.id)
+
+    if rows:
+        badge_service.adjust(badge_service.PENDING_APPLICATIONS, -len(rows), campaign.creator_id)
+        messages.success(request, f'{len(rows)} application(s) {new_status}.')
+    else:
+        messages.warning(request, 'No pending applications were selected.')
+    return redirect('campaigns:brand_campaign_applications', campaign_id=campaign.id)
+
+@login_required
+@entitlements.requires_feature(entitlements.EXPORTS)
+def export_campaign_applications(request, campaign_id, export_format):
+    """Stream a spreadsheet of a campaign's applicants"""
+    campaign = get_object_or_404(Campaign, id=campaign_id)
+
+    if export_format not in exports.EXPORT_FORMATS:
+        raise Http404('Unsupported export format')
+
+    # Only the campaign creator or admin can export applications
+    if request.user.user_type not in ['brand', 'admin']:
+        messages.error(request, 'Only brand users or admins can export applications.')
+        return redirect('campaigns:campaign_detail', campaign_id=campaign.id)
+
+    # If user is a brand, check if they are the campaign creator
+    if request.user.user_type == 'brand' and campaign.creator_id != request.user.id:
+        messages.error(request, 'You can only export applications for your own campaigns.')
+        return redirect('campaigns:campaign_detail', campaign_id=campaign.id)
+
+    applications = (
+        CampaignApplication.objects.filter(campaign=campaign)
+        .select_related('influencer')
+        .order_by('applied_at', 'id')
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    return exports.export_response(
+        export_format,
+        f'campaign-{campaign.id}-applications',
+        exports.APPLICATION_EXPORT_HEADER,
+        exports.application_rows(applications),
+    )
+
 # Custom Offer Views
 @login_required
 def send_custom_offer(request, influencer_id):
@@ -292,10 +453,13 @@ def send_custom_offer(request, influencer_id):
     if request.method == 'POST':
         form = CustomOfferForm(request.POST)
         if form.is_valid():
-            offer = form.save(commit=False)
-            offer.brand = request.user
-            offer.influencer = influencer
-            offer.save()
+            with transaction.atomic():
+                offer = form.save(commit=False)
+                offer.brand = request.user
+                offer.influencer = influencer
+                offer.save()
+                analytics_service.record_offer_sent(offer)
+            badge_service.adjust(badge_service.PENDING_OFFERS, 1, influencer.id)
             return redirect('campaigns:offer_sent_success')
     else:
         # Pre-populate form with brand's campaigns
@@ -308,46 +472,207 @@ def send_custom_offer(request, influencer_id):
     }
     return render(request, 'campaigns/send_custom_offer.html', context)
 
+@login_required
+@entitlements.requires_feature(entitlements.BULK_OFFERS)
+def bulk_send_offer(request):
+    """Allow brands to send the same custom offer to many selected influencers"""
+    if request.user.user_type != 'brand':
+        messages.error(request, 'Only brand users can send custom offers.')
+        return redirect('home')
+
+    # The search page posts the selection, since up to MAX_BULK_OFFER_RECIPIENTS ids don't fit in a URL
+    data = request.POST if request.method == 'POST' else request.GET
+    selected_ids = {int(pk) for pk in data.getlist('influencer_ids') if pk.isdigit()}
+    if not selected_ids:
+        messages.error(request, 'Select at least one influencer to send an offer to.')
+        return redirect('influencers')
+    if len(selected_ids) > MAX_BULK_OFFER_RECIPIENTS:
+        messages.error(request, f'You can send an offer to at most {MAX_BULK_OFFER_RECIPIENTS} influencers at once.')
+        return redirect('influencers')
+
+    influencers = list(
+        CustomUser.objects.filter(id__in=selected_ids, user_type='influencer')
+        .order_by('username')
+        .only('id', 'username')
+    )
+    if not influencers:
+        messages.error(request, 'None of the selected users are influencers.')
+        return redirect('influencers')
+
+    if request.method == 'POST' and request.POST.get('step') != 'select':
+        form = CustomOfferForm(request.POST)
+        form.fields['campaign'].queryset = Campaign.objects.filter(creator=request.user)
+        if form.is_valid():
+            # Validated once, then copied onto every recipient's offer
+            offers = send_bulk_offers(
+                request.user,
+                form.save(commit=False),
+                [influencer.id for influencer in influencers],
+            )
+            messages.success(request, f'Offer sent to {len(offers)} influencers.')
+            return redirect('campaigns:offer_sent_success')
+    else:
+        form = CustomOfferForm()
+        form.fields['campaign'].queryset = Campaign.objects.filter(creator=request.user)
+
+    context = {
+        'form': form,
+        'influencers': influencers,
+    }
+    return render(request, 'campaigns/bulk_send_offer.html', context)
+
 @login_required
 def my_offers(request):
     """Show influencer's received offers or brand's sent offers"""
     if request.user.user_type == 'influencer':
-        offers = CustomOffer.objects.filter(influencer=request.user).order_by('-created_at')
+        offers = CustomOffer.objects.filter(influencer=request.user)
         template = 'campaigns/influencer_offers.html'
     elif request.user.user_type == 'brand':
-        offers = CustomOffer.objects.filter(brand=request.user).order_by('-created_at')
+        offers = CustomOffer.objects.filter(brand=request.user)
         template = 'campaigns/brand_offers.html'
     else:
         messages.error(request, 'Invalid user type.')
         return redirect('home')
-    
+
+    # Per-status counts in one grouped query
+    status_counts = _status_counts(offers)
+
+    offers = offers.select_related('brand', 'influencer', 'campaign')
+
+    # Apply status filter; expired offers only show on their own tab
+    # (the expire_offers job keeps their status current)
+    active_statuses = [value for value, label in CustomOffer.STATUS_CHOICES if value != 'expired']
+    status_filter = request.GET.get('status', '')
+    if status_filter in dict(CustomOffer.STATUS_CHOICES):
+        offers = offers.filter(status=status_filter)
+    else:
+        status_filter = ''
+        offers = offers.filter(status__in=active_statuses)
+
+    # Cursor pagination
+    page = paginate_by_cursor(offers, request.GET.get('cursor'), OFFERS_PER_PAGE, 'created_at')
+
     context = {
-        'offers': offers,
+        'offers': page,
+        'status_filter': status_filter,
+        'status_tabs': _status_tabs(status_counts, CustomOffer.STATUS_CHOICES),
+        'total_offers': sum(status_counts.get(value, 0) for value in active_statuses),
     }
     return render(request, template, context)
 
+@login_required
+@entitlements.requires_feature(entitlements.EXPORTS)
+def export_offers(request, export_format):
+    """Stream a spreadsheet of the offers a brand has sent"""
+    if export_format not in exports.EXPORT_FORMATS:
+        raise Http404('Unsupported export format')
+
+    if request.user.user_type != 'brand':
+        messages.error(request, 'Only brand users can export offers.')
+        return redirect('campaigns:my_offers')
+
+    offers = (
+        CustomOffer.objects.filter(brand=request.user)
+        .select_related('influencer', 'campaign')
+        .order_by('created_at', 'id')
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    return exports.export_response(
+        export_format,
+        'sent-offers',
+        exports.OFFER_EXPORT_HEADER,
+        exports.offer_rows(offers),
+    )
+
 @login_required
 def offer_detail(request, offer_id):
     """View details of a custom offer"""
-    offer = get_object_or_404(CustomOffer, id=offer_id)
+    offer = get_object_or_404(CustomOffer.objects.select_related('brand', 'influencer', 'campaign'), id=offer_id)
     
     # Only the brand or influencer involved can view the offer
     if request.user not in [offer.brand, offer.influencer]:
         messages.error(request, 'You do not have permission to view this offer.')
         return redirect('home')
-    
+
+    # Latest page of the negotiation thread; older pages via cursor
+    cursor = request.GET.get('cursor')
+    thread = paginate_by_cursor(
+        offer.messages.select_related('sender'), cursor, OFFER_MESSAGES_PER_PAGE, 'created_at'
+    )
+    thread_messages = list(reversed(thread.items))
+
+    # Clients on the latest page poll for messages after the newest one shown
+    poll_cursor = ''
+    if not cursor and thread_messages:
+        poll_cursor = encode_cursor(thread_messages[-1].created_at, thread_messages[-1].id)
+
     context = {
         'offer': offer,
+        'thread': thread,
+        'thread_messages': thread_messages,
+        'poll_cursor': poll_cursor,
+        'is_latest_page': not cursor,
+        'message_form': OfferMessageForm(),
     }
     return render(request, 'campaigns/offer_detail.html', context)
 
+@login_required
+@require_POST
+def send_offer_message(request, offer_id):
+    """Post a message or counter-offer to an offer's negotiation thread"""
+    offer = get_object_or_404(CustomOffer, id=offer_id)
+
+    if request.user.id not in (offer.brand_id, offer.influencer_id):
+        messages.error(request, 'You do not have permission to message on this offer.')
+        return redirect('home')
+
+    form = OfferMessageForm(request.POST)
+    if form.is_valid():
+        message = post_offer_message(
+            offer, request.user, form.cleaned_data['body'], form.cleaned_data['counter_amount']
+        )
+        if message is None:
+            messages.error(request, 'Counter-offers can only be made on pending offers.')
+    else:
+        messages.error(request, next(iter(form.errors.values()))[0])
+
+    return redirect('campaigns:offer_detail', offer_id=offer.id)
+
+@login_required
+def offer_messages_since(request, offer_id):
+    """Return thread messages newer than ``cursor`` as JSON, for polling clients"""
+    offer = get_object_or_404(CustomOffer, id=offer_id)
+
+    if request.user.id not in (offer.brand_id, offer.influencer_id):
+        raise Http404
+
+    page = fetch_after_cursor(
+        offer.messages.select_related('sender'), request.GET.get('cursor'), OFFER_MESSAGES_PER_PAGE, 'created_at'
+    )
+    return JsonResponse({
+        'messages': [
+            {
+                'id': message.id,
+                'sender': message.sender.username,
+                'mine': message.sender_id == request.user.id,
+                'body': message.body,
+                'counter_amount': str(message.counter_amount) if message.is_counter_offer else None,
+                'created_at': message.created_at.isoformat(),
+            }
+            for message in page
+        ],
+        'cursor': page.next_cursor,
+        'offer_amount': str(offer.offer_amount),
+        'status': offer.status,
+    })
+
 @login_required
 def accept_offer(request, offer_id):
     """Allow influencers to accept custom offers"""
     offer = get_object_or_404(CustomOffer, id=offer_id)
     
     # Only the influencer can accept their offer
-    if request.user != offer.influencer:
+    if offer.influencer_id != request.user.id:
         messages.error(request, 'You do not have permission to accept this offer.')
         return redirect('campaigns:offer_detail', offer_id=offer.id)
     
@@ -357,18 +682,30 @@ def accept_offer(request, offer_id):
         return redirect('campaigns:offer_detail', offer_id=offer.id)
     
     if request.method == 'POST':
-        offer.status = 'accepted'
-        offer.influencer_response = request.POST.get('response', '')
-        offer.save()
-        
-        # Update analytics
-        analytics, created = InfluencerAnalytics.objects.get_or_create(
-            influencer=request.user,
-            defaults={'total_applications': 0, 'approved_applications': 0, 'total_earnings': 0, 'profile_views': 0}
-        )
-        analytics.total_earnings += offer.offer_amount
-        analytics.save()
-        
+        # The amount the influencer saw; a counter-offer may have changed it since
+        try:
+            expected_amount = Decimal(request.POST.get('offer_amount', ''))
+        except InvalidOperation:
+            expected_amount = None
+
+        accepted = 0
+        if expected_amount is not None:
+            with transaction.atomic():
+                # Conditional UPDATE so an offer expired or re-priced in the meantime can't be accepted
+                accepted = CustomOffer.objects.filter(id=offer.id, status='pending', offer_amount=expected_amount).update(
+                    status='accepted', influencer_response=request.POST.get('response', ''), updated_at=timezone.now()
+                )
+                if accepted:
+                    # Record the amount that was actually accepted
+                    offer.refresh_from_db()
+                    analytics_service.record_offer_accepted(offer)
+
+        if accepted:
+            badge_service.adjust(badge_service.PENDING_OFFERS, -1, offer.influencer_id)
+        elif CustomOffer.objects.filter(id=offer.id, status='pending').exists():
+            messages.error(request, 'The offer amount has changed. Please review the offer before accepting it.')
+        else:
+            messages.error(request, 'This offer has already been processed.')
         return redirect('campaigns:offer_detail', offer_id=offer.id)
     
     return redirect('campaigns:offer_detail', offer_id=offer.id)
@@ -379,7 +716,7 @@ def reject_offer(request, offer_id):
     offer = get_object_or_404(CustomOffer, id=offer_id)
     
     # Only the influencer can reject their offer
-    if request.user != offer.influencer:
+    if offer.influencer_id != request.user.id:
         messages.error(request, 'You do not have permission to reject this offer.')
         return redirect('campaigns:offer_detail', offer_id=offer.id)
     
@@ -389,9 +726,19 @@ def reject_offer(request, offer_id):
         return redirect('campaigns:offer_detail', offer_id=offer.id)
     
     if request.method == 'POST':
-        offer.status = 'rejected'
-        offer.influencer_response = request.POST.get('response', '')
-        offer.save()
+        with transaction.atomic():
+            # Conditional UPDATE so an offer expired in the meantime can't be rejected
+            offer.influencer_response = request.POST.get('response', '')
+            rejected = CustomOffer.objects.filter(id=offer.id, status='pending').update(
+                status='rejected', influencer_response=offer.influencer_response, updated_at=timezone.now()
+            )
+            if rejected:
+                analytics_service.record_offer_rejected(offer)
+
+        if rejected:
+            badge_service.adjust(badge_service.PENDING_OFFERS, -1, offer.influencer_id)
+        else:
+            messages.error(request, 'This offer has already been processed.')
         return redirect('campaigns:offer_detail', offer_id=offer.id)
     
     return redirect('campaigns:offer_detail', offer_id=offer.id)
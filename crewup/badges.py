@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from adminPanel.models import ContactMessage
+from campaigns.models import CampaignApplication, CustomOffer
+
+PENDING_OFFERS = 'pending_offers'
+PENDING_APPLICATIONS = 'pending_applications'
+UNREAD_MESSAGES = 'unread_messages'
+
+# Badges shown to each user type in the navigation
+BADGES_BY_USER_TYPE = {
+    'influencer': [PENDING_OFFERS],
+    'brand': [PENDING_APPLICATIONS],
+    'admin': [UNREAD_MESSAGES],
+}
+
+# Counters are refreshed from the database at least this often, so any drift heals itself
+BADGE_CACHE_TIMEOUT = getattr(settings, 'BADGE_CACHE_TIMEOUT', 60 * 60)
+
+
+def _key(name, user_id=None):
+    # Unread contact messages are shared by every admin
+    if name == UNREAD_MESSAGES:
+        return f'badges:{name}'
+    return f'badges:{name}:{user_id}'
+
+
+def _count(name, user_id):
+    if name == PENDING_OFFERS:
+        return CustomOffer.objects.filter(influencer_id=user_id, status='pending').count()
+    if name == PENDING_APPLICATIONS:
+        return CampaignApplication.objects.filter(campaign__creator_id=user_id, status='pending').count()
+    if name == UNREAD_MESSAGES:
+        return ContactMessage.objects.filter(is_read=False).count()
+    raise ValueError(f'Unknown badge: {name}')
+
+
+def get_badges(user):
+    """Return ``{badge_name: count}`` for a user with a single cache round trip.
+
+    Counters missing from the cache are counted once and stored.
+    """
+    names = BADGES_BY_USER_TYPE.get(user.user_type, [])
+    if not names:
+        return {}
+
+    keys = {name: _key(name, user.id) for name in names}
+    cached = cache.get_many(keys.values())
+
+    badges = {}
+    for name, key in keys.items():
+        value = cached.get(key)
+        if value is None:
+            value = _count(name, user.id)
+            cache.add(key, value, BADGE_CACHE_TIMEOUT)
+        badges[name] = value
+    return badges
+
+
+def adjust(name, delta, user_id=None):
+    """Add ``delta`` to a cached counter. Missing counters are left to be recounted on next read."""
+    if not delta:
+        return
+    key = _key(name, user_id)
+    try:
+        if delta > 0:
+            cache.incr(key, delta)
+        else:
+            value = cache.decr(key, -delta)
+            if value < 0:
+                cache.delete(key)
+    except ValueError:
+        pass
+
+
+def invalidate(name, user_ids=(None,)):
+    """Drop counters so they are recounted on next read, e.g. after a bulk change"""
+    cache.delete_many([_key(name, user_id) for user_id in set(user_ids)])
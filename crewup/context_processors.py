@@ -0,0 +1,11 @@
+from django.utils.functional import SimpleLazyObject
+
+from . import badges as badge_service
+
+
+def badges(request):
+    """Expose the navigation badge counts, read from the cache only if a template uses them"""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {'badges': {}}
+    return {'badges': SimpleLazyObject(lambda: badge_service.get_badges(user))}
@@ -0,0 +1,72 @@
+import atexit
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'NOTIFICATION_WORKERS', 2),
+    thread_name_prefix='notifications',
+)
+
+
+@atexit.register
+def _drain():
+    # Queued jobs live only in this process, so finish them before a graceful shutdown exits
+    queued = _executor._work_queue.qsize()
+    if queued:
+        logger.info('Sending %d queued notification jobs before exit', queued)
+    _executor.shutdown(wait=True)
+
+
+def _run(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Notification job %s failed', getattr(func, '__name__', func))
+
+
+def _run_in_worker(func, args, kwargs):
+    try:
+        _run(func, args, kwargs)
+    finally:
+        # Worker threads keep their own connections; don't leave them dangling
+        close_old_connections()
+
+
+def enqueue(func, *args, **kwargs):
+    """Run ``func`` off the request thread once the current transaction commits.
+
+    Jobs are dropped if the transaction rolls back. With NOTIFICATIONS_ASYNC
+    disabled (tests, management commands) the job runs inline on commit instead.
+    """
+    def submit():
+        if getattr(settings, 'NOTIFICATIONS_ASYNC', True):
+            _executor.submit(_run_in_worker, func, args, kwargs)
+        else:
+            _run(func, args, kwargs)
+
+    transaction.on_commit(submit)
+
+
+def send_emails(messages):
+    """Send ``(subject, body, [recipient])`` tuples over a single mail connection.
+
+    A message that can't be sent is logged and skipped. Returns the number sent.
+    """
+    sent = 0
+    with get_connection() as connection:
+        for subject, body, recipients in messages:
+            if not recipients:
+                continue
+            try:
+                sent += connection.send_messages(
+                    [EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, recipients, connection=connection)]
+                ) or 0
+            except Exception:
+                logger.exception('Could not send "%s" to %s', subject, ', '.join(recipients))
+    return sent
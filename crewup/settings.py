@@ -68,6 +68,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'crewup.context_processors.badges',
             ],
         },
     },
@@ -83,6 +84,11 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'TEST': {
+            # File-backed so threaded tests see real SQLite locking instead of
+            # shared-cache "table is locked" errors
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
@@ -141,12 +147,72 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache settings
+# The local-memory cache is per process; point CACHE_BACKEND/CACHE_LOCATION at
+# Redis or Memcached when running more than one worker so counters are shared.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'crewup'),
+    }
+}
+
+# A local-memory cache can't be invalidated from other workers or from the background
+# jobs, so anything invalidated out of process is cached briefly, or not at all, with it
+SHARED_CACHE = CACHES['default']['BACKEND'] != 'django.core.cache.backends.locmem.LocMemCache'
+
+# Navigation badge counters are recounted from the database at least this often (seconds);
+# offer expiry and other workers only adjust the copies in a shared cache
+BADGE_CACHE_TIMEOUT = 60 * 60 if SHARED_CACHE else 30
+
+# Cached subscription entitlements (plan and Pro features) are re-read at least this often
+# (seconds); webhooks and the subscription sweeper change them from another process
+ENTITLEMENT_CACHE_TIMEOUT = 15 * 60 if SHARED_CACHE else 30
+
+# Plans are re-read from the database at least this often (seconds); sync_plans runs in
+# another process, and deactivates a replaced Stripe Price only once this has passed
+PLAN_CACHE_TIMEOUT = 5 * 60 if SHARED_CACHE else 30
+
+# Activity events are folded into analytics once they are this old (seconds), so
+# transactions that commit out of id order are never skipped by the materializer
+ANALYTICS_SAFETY_LAG = 30
+
 # Authentication settings
+# EmailOrUsernameModelBackend also accepts plain usernames (e.g. the Django admin login),
+# so a failed login is looked up and hashed once rather than once per backend
 AUTHENTICATION_BACKENDS = [
     'authentication.backends.EmailOrUsernameModelBackend',
-    'django.contrib.auth.backends.ModelBackend',
 ]
 
+# With a shared cache, logged-in users are cached by the auth backend and re-read at
+# least this often (seconds)
+USER_CACHE_TIMEOUT = 5 * 60
+
+# Session storage: 'cached_db' reads sessions from the cache and writes through to the
+# database; 'signed_cookies' keeps them in the browser and needs no storage at all;
+# 'db' is Django's default, and ours without a shared cache, where a logout would only
+# reach the worker that handled it
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_ENGINES[os.getenv('SESSION_MODE', 'cached_db' if SHARED_CACHE else 'db')]
+
+# Login throttling: failed logins are counted per client IP and per account over a sliding
+# window; past the limit the IP is locked out, and so is the account, except for client
+# IPs that have logged in to it before. LOGIN_THROTTLE_CACHE names the cache holding the counters, which must be shared
+# between workers (Redis or Memcached)
+LOGIN_THROTTLE_CACHE = os.getenv('LOGIN_THROTTLE_CACHE', 'default')
+LOGIN_THROTTLE_POLICIES = {
+    'ip': {'limit': 20, 'window': 5 * 60, 'lockout': 15 * 60},
+    'account': {'limit': 5, 'window': 15 * 60, 'lockout': 15 * 60},
+}
+# Set to e.g. 'HTTP_X_FORWARDED_FOR' when behind proxies that append to it, with the number
+# of trusted proxies in front of the app; REMOTE_ADDR is used otherwise
+LOGIN_THROTTLE_IP_HEADER = os.getenv('LOGIN_THROTTLE_IP_HEADER') or None
+LOGIN_THROTTLE_PROXY_COUNT = int(os.getenv('LOGIN_THROTTLE_PROXY_COUNT', '1'))
+
 LOGIN_REDIRECT_URL = '/'
 LOGIN_URL = '/auth/login/'
 LOGOUT_REDIRECT_URL = '/'
@@ -158,8 +224,29 @@ MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
 STRIPE_PUBLIC_KEY = os.getenv('STRIPE_PUBLIC_KEY', '')
 STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY', '')
 STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET', '')
+# Override to point at a local stand-in (python manage.py fake_stripe) for offline load tests
+STRIPE_API_BASE = os.getenv('STRIPE_API_BASE', '')
+# Stripe HTTP client: one pooled keep-alive session per process, bounded timeouts (seconds)
+STRIPE_HTTP_POOL_SIZE = int(os.getenv('STRIPE_HTTP_POOL_SIZE', '10'))
+STRIPE_CONNECT_TIMEOUT = float(os.getenv('STRIPE_CONNECT_TIMEOUT', '3.05'))
+STRIPE_READ_TIMEOUT = float(os.getenv('STRIPE_READ_TIMEOUT', '20'))
+# Network failures, 409s and 5xx are retried with jittered exponential backoff
+STRIPE_MAX_NETWORK_RETRIES = int(os.getenv('STRIPE_MAX_NETWORK_RETRIES', '2'))
 
 # Payment settings
 PAYMENT_CURRENCY = 'usd'
+# Days before period end to send renewal reminders, hours after period end before an
+# unrenewed subscription is past due, and days past due before cancelling
+SUBSCRIPTION_REMINDER_DAYS = 3
+SUBSCRIPTION_LAPSE_HOURS = 24
+SUBSCRIPTION_GRACE_DAYS = 7
 PAYMENT_SUCCESS_URL = 'http://localhost:8000/payment/success/'
 PAYMENT_CANCEL_URL = 'http://localhost:8000/payment/cancel/'
+
+# Email settings
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'CrewUp <no-reply@crewup.local>')
+
+# Notification settings: e-mails are sent from a background thread pool after commit
+NOTIFICATIONS_ASYNC = True
+NOTIFICATION_WORKERS = 2
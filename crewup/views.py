@@ -5,6 +5,8 @@ from django.contrib import messages
 from django.db.models import Q
 from authentication.models import CustomUser
 from campaigns.models import Campaign, CampaignApplication, InfluencerAnalytics
+from campaigns.analytics import record_profile_view
+from crewup import badges as badge_service
 
 
 
@@ -202,23 +204,8 @@ def influencer_dashboard(request):
     completed_applications = request.user.campaign_applications.filter(status='completed')
     total_earnings = sum(app.campaign.budget for app in completed_applications)
 
-    # Get or create analytics
-    analytics, created = InfluencerAnalytics.objects.get_or_create(
-        influencer=request.user,
-        defaults={
-            'total_applications': applications_sent,
-            'approved_applications': request.user.campaign_applications.filter(status='approved').count(),
-            'total_earnings': total_earnings,
-            'profile_views': 0
-        }
-    )
-
-    # Update analytics if not created
-    if not created:
-        analytics.total_applications = applications_sent
-        analytics.approved_applications = request.user.campaign_applications.filter(status='approved').count()
-        analytics.total_earnings = total_earnings
-        analytics.save()
+    # Analytics are maintained by the materializer and reconcile_analytics; only read them here
+    analytics = InfluencerAnalytics.objects.filter(influencer=request.user).first()
 
     # Get recent applications for display
     recent_applications = request.user.campaign_applications.select_related('campaign').order_by('-applied_at')[:5]
@@ -233,7 +220,7 @@ def influencer_dashboard(request):
         'applications_sent': applications_sent,
         'active_campaigns': active_campaigns,
         'total_earnings': total_earnings,
-        'profile_views': analytics.profile_views,
+        'profile_views': analytics.profile_views if analytics else 0,
         'recent_applications': recent_applications,
         'available_campaigns': available_campaigns,
     }
@@ -293,6 +280,7 @@ def contact(request):
             subject=subject,
             message=message_text
         )
+        badge_service.adjust(badge_service.UNREAD_MESSAGES, 1)
 
         messages.success(request, 'Thank you for contacting us!')
         return render(request, 'contact.html', {'success': True})
@@ -312,6 +300,8 @@ def influencer_profile(request, influencer_id):
     try:
         # Get the influencer by ID
         influencer = CustomUser.objects.get(id=influencer_id, user_type='influencer')
+        if request.user.id != influencer.id:
+            record_profile_view(influencer.id)
 
         context = {
             'influencer': influencer,
@@ -1,3 +1,53 @@
 from django.contrib import admin
+from django.utils import timezone
+from . import catalog
+from .models import LedgerEntry, MonthlyRevenue, Plan, WebhookEvent
 
-# Register your models here.
+@admin.register(Plan)
+class PlanAdmin(admin.ModelAdmin):
+    list_display = ('name', 'plan_type', 'billing_cycle', 'amount', 'currency', 'is_active', 'stripe_price_id', 'synced_at')
+    list_filter = ('plan_type', 'billing_cycle', 'is_active')
+    readonly_fields = ('stripe_product_id', 'stripe_price_id', 'synced_amount', 'synced_at', 'retired_price_id',
+                       'created_at', 'updated_at')
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        catalog.invalidate(obj)
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ('stripe_event_id', 'event_type', 'status', 'attempts', 'next_attempt_at', 'received_at')
+    list_filter = ('status', 'event_type')
+    search_fields = ('stripe_event_id',)
+    readonly_fields = ('stripe_event_id', 'event_type', 'payload', 'stripe_created', 'attempts',
+                       'last_error', 'received_at', 'processed_at')
+    actions = ['retry_now']
+
+    @admin.action(description='Retry selected events now')
+    def retry_now(self, request, queryset):
+        queryset.exclude(status='processed').update(status='pending', next_attempt_at=timezone.now())
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ('occurred_at', 'entry_type', 'plan_type', 'billing_cycle', 'amount', 'mrr_change', 'reference')
+    list_filter = ('entry_type', 'plan_type', 'billing_cycle', 'month')
+    search_fields = ('reference',)
+    raw_id_fields = ('payment', 'subscription')
+
+    # The ledger is append-only; MonthlyRevenue is kept in step as entries are written
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(MonthlyRevenue)
+class MonthlyRevenueAdmin(admin.ModelAdmin):
+    list_display = ('month', 'plan_type', 'billing_cycle', 'revenue', 'mrr_change', 'new_subscriptions', 'churned_subscriptions')
+    list_filter = ('plan_type', 'billing_cycle')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class PaymentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'payments'
+
+    def ready(self):
+        # Importing checks registers the latency cache check
+        from . import checks, stripe_client
+
+        # Configure Stripe once for views, webhook workers and management commands alike
+        stripe_client.configure()
@@ -0,0 +1,95 @@
+import logging
+from datetime import timedelta
+
+import stripe
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Plan
+
+logger = logging.getLogger(__name__)
+
+# Plans are re-read from the database at least this often (seconds)
+PLAN_CACHE_TIMEOUT = getattr(settings, 'PLAN_CACHE_TIMEOUT', 5 * 60)
+
+
+def _key(plan_type, billing_cycle):
+    return f'plans:{plan_type}:{billing_cycle}'
+
+
+def get_plan(plan_type, billing_cycle):
+    """Return the active plan for a type and billing cycle, or None. Served from the cache."""
+    key = _key(plan_type, billing_cycle)
+    plan = cache.get(key)
+    if plan is None:
+        plan = Plan.objects.filter(plan_type=plan_type, billing_cycle=billing_cycle, is_active=True).first()
+        # Cache misses too, so bogus URLs don't reach the database every time
+        cache.set(key, plan or False, PLAN_CACHE_TIMEOUT)
+    return plan or None
+
+
+def invalidate(plan):
+    cache.delete(_key(plan.plan_type, plan.billing_cycle))
+
+
+def sync_plan(plan):
+    """Create the plan's Stripe Product and Price if missing or out of date. Returns True if Stripe was called."""
+    if not plan.needs_sync:
+        return False
+
+    if not plan.stripe_product_id:
+        product = stripe.Product.create(
+            name=f'CrewUp {plan.name} ({plan.billing_cycle})',
+            description=plan.description or None,
+            metadata={'plan_type': plan.plan_type, 'billing_cycle': plan.billing_cycle},
+        )
+        plan.stripe_product_id = product.id
+
+    if plan.retired_price_id:
+        # Synced again before the last replaced Price was retired; retire it now
+        _retire_price(plan.retired_price_id)
+    plan.retired_price_id = plan.stripe_price_id
+    price = stripe.Price.create(
+        product=plan.stripe_product_id,
+        currency=plan.currency,
+        unit_amount=plan.unit_amount,
+        recurring={'interval': plan.stripe_interval},
+        metadata={'plan_type': plan.plan_type, 'billing_cycle': plan.billing_cycle},
+    )
+    plan.stripe_price_id = price.id
+    plan.synced_amount = plan.amount
+    plan.synced_at = timezone.now()
+    plan.save(update_fields=[
+        'stripe_product_id', 'stripe_price_id', 'synced_amount', 'synced_at', 'retired_price_id', 'updated_at',
+    ])
+    invalidate(plan)
+
+    logger.info('Synced plan %s to Stripe price %s', plan, plan.stripe_price_id)
+    return True
+
+
+def _retire_price(price_id):
+    # Prices can't be edited; deactivate the old one so it can't be used for new checkouts
+    stripe.Price.modify(price_id, active=False)
+
+
+def retire_prices():
+    """Deactivate replaced Prices once every cached copy of their plan has expired.
+
+    Other workers may still hold the plan, and so the old Price, for up to
+    PLAN_CACHE_TIMEOUT after a sync. Returns the number of Prices deactivated.
+    """
+    retired = 0
+    cutoff = timezone.now() - timedelta(seconds=PLAN_CACHE_TIMEOUT)
+    for plan in Plan.objects.exclude(retired_price_id='').filter(synced_at__lte=cutoff):
+        _retire_price(plan.retired_price_id)
+        Plan.objects.filter(id=plan.id, retired_price_id=plan.retired_price_id).update(retired_price_id='')
+        retired += 1
+    return retired
+
+
+def sync_plans():
+    """Retire replaced Prices that are due and sync every active plan. Returns the number of plans synced."""
+    retire_prices()
+    return sum(sync_plan(plan) for plan in Plan.objects.filter(is_active=True))
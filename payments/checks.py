@@ -0,0 +1,19 @@
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches)
+def check_stripe_latency_cache(app_configs, **kwargs):
+    """Warn when Stripe latency histograms live in a cache private to each process"""
+    if not isinstance(caches['default'], LocMemCache):
+        return []
+    return [
+        Warning(
+            'The default cache is a local-memory cache, so the Stripe latency report only '
+            'shows calls made by the worker serving the admin page, and none from '
+            'process_webhooks, sweep_subscriptions or sync_plans.',
+            hint='Point CACHE_BACKEND/CACHE_LOCATION at Redis or Memcached.',
+            id='payments.W001',
+        )
+    ]
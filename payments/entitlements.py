@@ -0,0 +1,88 @@
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import transaction
+from django.shortcuts import redirect
+
+from .models import Subscription
+
+BULK_OFFERS = 'bulk_offers'
+EXPORTS = 'exports'
+MATCHING = 'matching'
+
+ALL_FEATURES = frozenset([BULK_OFFERS, EXPORTS, MATCHING])
+
+# Features unlocked by each plan type
+FEATURES_BY_PLAN = {
+    'basic': frozenset(),
+    'pro': ALL_FEATURES,
+    'enterprise': ALL_FEATURES,
+}
+
+# Past-due subscriptions keep their features through the sweeper's grace period
+ENTITLED_STATUSES = ('active', 'trialing', 'past_due')
+
+# Entitlements are re-read from the database at least this often (seconds)
+ENTITLEMENT_CACHE_TIMEOUT = getattr(settings, 'ENTITLEMENT_CACHE_TIMEOUT', 15 * 60)
+
+
+def _key(user_id):
+    return f'entitlements:{user_id}'
+
+
+def get_entitlements(user):
+    """Return ``{'plan': plan_type or None, 'features': frozenset}`` for a user.
+
+    Memoized on the user object for the rest of the request, and cached across
+    requests until a webhook or the subscription sweeper changes the subscription.
+    """
+    memo = getattr(user, '_entitlements', None)
+    if memo is not None:
+        return memo
+
+    if not user.is_authenticated:
+        entitlements = {'plan': None, 'features': frozenset()}
+    elif user.user_type == 'admin':
+        entitlements = {'plan': None, 'features': ALL_FEATURES}
+    else:
+        entitlements = cache.get(_key(user.id))
+        if entitlements is None:
+            plan_type = (
+                Subscription.objects.filter(user_id=user.id, status__in=ENTITLED_STATUSES)
+                .values_list('plan_type', flat=True)
+                .first()
+            )
+            entitlements = {'plan': plan_type, 'features': FEATURES_BY_PLAN.get(plan_type, frozenset())}
+            cache.set(_key(user.id), entitlements, ENTITLEMENT_CACHE_TIMEOUT)
+
+    user._entitlements = entitlements
+    return entitlements
+
+
+def has_feature(user, feature):
+    return feature in get_entitlements(user)['features']
+
+
+def invalidate(user_ids):
+    """Drop cached entitlements so they are re-read on the users' next request.
+
+    Deferred until commit, so a concurrent request can't cache the old subscription again.
+    """
+    keys = [_key(user_id) for user_id in set(user_ids)]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def requires_feature(feature, message='Upgrade to a Pro plan to use this feature.'):
+    """View decorator sending users without ``feature`` to the pricing page"""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not has_feature(request.user, feature):
+                messages.error(request, message)
+                return redirect('pricing')
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
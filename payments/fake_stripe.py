@@ -0,0 +1,341 @@
+"""Local stand-in for the parts of the Stripe API CrewUp uses, for offline load tests.
+
+Covers Products, Prices, checkout Sessions and subscription cancellation, plus
+signed webhook delivery.
+
+Point the app at it with STRIPE_API_BASE=http://127.0.0.1:12111 and start it
+with ``python manage.py fake_stripe``. It keeps everything in memory.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import queue
+import re
+import secrets
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+logger = logging.getLogger(__name__)
+
+_KEY_PART = re.compile(r'\[([^\]]*)\]')
+
+
+def sign_payload(payload, secret, timestamp=None):
+    """Return a Stripe-Signature header value for ``payload``"""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    signature = hmac.new(secret.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={signature}'
+
+
+def decode_form(body):
+    """Decode Stripe's bracketed form encoding (``a[b][0][c]=v``) into nested dicts and lists"""
+    result = {}
+    for key, value in parse_qsl(body, keep_blank_values=True):
+        head = key.split('[', 1)[0]
+        parts = [head] + _KEY_PART.findall(key[len(head):])
+        node = result
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = value
+    return _listify(result)
+
+
+def _listify(node):
+    # Dicts keyed 0..n-1 came from array parameters
+    if not isinstance(node, dict):
+        return node
+    node = {key: _listify(value) for key, value in node.items()}
+    if node and all(key.isdigit() for key in node):
+        return [node[key] for key in sorted(node, key=int)]
+    return node
+
+
+def _new_id(prefix):
+    return f'{prefix}_test_{secrets.token_hex(12)}'
+
+
+class FakeStripe:
+    """In-memory checkout sessions plus a rate-limited, signed webhook emitter"""
+
+    def __init__(self, base_url, webhook_url=None, webhook_secret='', rate=10.0,
+                 auto_complete=False, duplicate_every=0):
+        self.base_url = base_url.rstrip('/')
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret
+        self.rate = rate
+        self.auto_complete = auto_complete
+        # Re-deliver every Nth event to exercise idempotent handling (0 disables)
+        self.duplicate_every = duplicate_every
+
+        self.sessions = {}
+        self.products = {}
+        self.prices = {}
+        self.subscriptions = {}
+        self.events = queue.Queue()
+        self.sent = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    # Catalog
+
+    def create_product(self, params):
+        product = {
+            'id': _new_id('prod'),
+            'object': 'product',
+            'active': True,
+            'name': params.get('name', ''),
+            'description': params.get('description'),
+            'metadata': params.get('metadata', {}),
+            'created': int(time.time()),
+        }
+        with self._lock:
+            self.products[product['id']] = product
+        return product
+
+    def create_price(self, params):
+        recurring = params.get('recurring')
+        price = {
+            'id': _new_id('price'),
+            'object': 'price',
+            'active': True,
+            'product': params.get('product'),
+            'currency': params.get('currency', 'usd'),
+            'unit_amount': int(params.get('unit_amount') or 0),
+            'recurring': {'interval': recurring['interval']} if recurring else None,
+            'type': 'recurring' if recurring else 'one_time',
+            'metadata': params.get('metadata', {}),
+            'created': int(time.time()),
+        }
+        with self._lock:
+            self.prices[price['id']] = price
+        return price
+
+    def update_price(self, price_id, params):
+        with self._lock:
+            price = self.prices.get(price_id)
+            if price is not None and 'active' in params:
+                price['active'] = params['active'] == 'true'
+        return price
+
+    # Checkout sessions
+
+    def create_session(self, params):
+        session_id = _new_id('cs')
+        mode = params.get('mode', 'payment')
+        line_items = params.get('line_items', [])
+        with self._lock:
+            amount_total = sum(
+                self.prices[item['price']]['unit_amount'] * int(item.get('quantity', 1))
+                for item in line_items if item.get('price') in self.prices
+            )
+        session = {
+            'id': session_id,
+            'object': 'checkout.session',
+            'url': f'{self.base_url}/pay/{session_id}',
+            'mode': mode,
+            'status': 'open',
+            'payment_status': 'unpaid',
+            'customer': None,
+            'customer_email': params.get('customer_email'),
+            'payment_intent': None,
+            'subscription': None,
+            'metadata': params.get('metadata', {}),
+            'line_items': line_items,
+            'amount_total': amount_total,
+            'currency': params.get('currency', 'usd'),
+            'success_url': params.get('success_url', ''),
+            'cancel_url': params.get('cancel_url', ''),
+            'created': int(time.time()),
+        }
+        with self._lock:
+            self.sessions[session_id] = session
+        if self.auto_complete:
+            self.complete_session(session_id)
+        return session
+
+    def complete_session(self, session_id):
+        """Mark a session paid, as if the customer finished checkout, and queue its webhook"""
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is None or session['status'] == 'complete':
+                return session
+            session.update(status='complete', payment_status='paid', customer=_new_id('cus'))
+            if session['mode'] == 'subscription':
+                session['subscription'] = self.create_subscription(customer=session['customer'])['id']
+            else:
+                session['payment_intent'] = _new_id('pi')
+        self.queue_event('checkout.session.completed', dict(session))
+        return session
+
+    # Subscriptions
+
+    def create_subscription(self, subscription_id=None, customer=None):
+        subscription = {
+            'id': subscription_id or _new_id('sub'),
+            'object': 'subscription',
+            'status': 'active',
+            'customer': customer,
+            'created': int(time.time()),
+        }
+        self.subscriptions[subscription['id']] = subscription
+        return subscription
+
+    def cancel_subscription(self, subscription_id):
+        """Cancel a live subscription now and queue customer.subscription.deleted"""
+        with self._lock:
+            subscription = self.subscriptions.get(subscription_id)
+            if subscription is None or subscription['status'] == 'canceled':
+                return None
+            subscription.update(status='canceled', canceled_at=int(time.time()))
+        self.queue_event('customer.subscription.deleted', dict(subscription))
+        return subscription
+
+    # Webhooks
+
+    def queue_event(self, event_type, data_object):
+        event = {
+            'id': _new_id('evt'),
+            'object': 'event',
+            'type': event_type,
+            'created': int(time.time()),
+            'livemode': False,
+            'data': {'object': data_object},
+        }
+        self.events.put(event)
+        return event
+
+    def deliver(self, event):
+        if not self.webhook_url:
+            return None
+        payload = json.dumps(event)
+        request = urllib.request.Request(
+            self.webhook_url,
+            data=payload.encode(),
+            headers={
+                'Content-Type': 'application/json',
+                'Stripe-Signature': sign_payload(payload, self.webhook_secret),
+            },
+            method='POST',
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return response.status
+        except Exception as exc:
+            logger.warning('Webhook delivery of %s failed: %s', event['id'], exc)
+            return None
+
+    def run_emitter(self):
+        """Deliver queued events at no more than ``rate`` per second until stopped"""
+        interval = 1.0 / self.rate if self.rate > 0 else 0
+        while not self._stopped.is_set():
+            try:
+                event = self.events.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            started = time.monotonic()
+            self.deliver(event)
+            self.sent += 1
+            if self.duplicate_every and self.sent % self.duplicate_every == 0:
+                self.deliver(event)
+            time.sleep(max(0, interval - (time.monotonic() - started)))
+
+    def stop(self):
+        self._stopped.set()
+
+
+class FakeStripeHandler(BaseHTTPRequestHandler):
+    server_version = 'FakeStripe/1.0'
+
+    @property
+    def stripe(self):
+        return self.server.stripe
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Request-Id', _new_id('req'))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _not_found(self):
+        self._send_json(404, {'error': {
+            'type': 'invalid_request_error',
+            'message': f'Unrecognized request URL ({self.command}: {self.path})',
+        }})
+
+    def _send_object(self, kind, object_id, obj):
+        if obj is None:
+            return self._send_json(404, {'error': {
+                'type': 'invalid_request_error',
+                'code': 'resource_missing',
+                'message': f"No such {kind}: '{object_id}'",
+            }})
+        return self._send_json(200, obj)
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        length = int(self.headers.get('Content-Length') or 0)
+        params = decode_form(self.rfile.read(length).decode())
+
+        if path == '/v1/checkout/sessions':
+            return self._send_json(200, self.stripe.create_session(params))
+        if path == '/v1/products':
+            return self._send_json(200, self.stripe.create_product(params))
+        if path == '/v1/prices':
+            return self._send_json(200, self.stripe.create_price(params))
+
+        match = re.fullmatch(r'/v1/prices/([\w-]+)', path)
+        if match:
+            return self._send_object('price', match.group(1), self.stripe.update_price(match.group(1), params))
+        return self._not_found()
+
+    def do_DELETE(self):
+        path = urlsplit(self.path).path
+
+        match = re.fullmatch(r'/v1/subscriptions/([\w-]+)', path)
+        if match:
+            return self._send_object('subscription', match.group(1), self.stripe.cancel_subscription(match.group(1)))
+        return self._not_found()
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+
+        for pattern, kind, store in (
+            (r'/v1/checkout/sessions/([\w-]+)', 'checkout.session', self.stripe.sessions),
+            (r'/v1/products/([\w-]+)', 'product', self.stripe.products),
+            (r'/v1/prices/([\w-]+)', 'price', self.stripe.prices),
+            (r'/v1/subscriptions/([\w-]+)', 'subscription', self.stripe.subscriptions),
+        ):
+            match = re.fullmatch(pattern, path)
+            if match:
+                return self._send_object(kind, match.group(1), store.get(match.group(1)))
+
+        # Hosted checkout page: paying is instant, then back to the app
+        match = re.fullmatch(r'/pay/([\w-]+)', path)
+        if match:
+            session = self.stripe.complete_session(match.group(1))
+            if session is None:
+                return self._not_found()
+            self.send_response(302)
+            self.send_header('Location', session['success_url'].replace('{CHECKOUT_SESSION_ID}', session['id']))
+            self.end_headers()
+            return None
+
+        return self._not_found()
+
+
+def make_server(host='127.0.0.1', port=12111, **options):
+    """Build the HTTP server; the FakeStripe state is available as ``server.stripe``"""
+    server = ThreadingHTTPServer((host, port), FakeStripeHandler)
+    server.daemon_threads = True
+    server.stripe = FakeStripe(f'http://{host}:{server.server_address[1]}', **options)
+    return server
@@ -0,0 +1,115 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import LedgerEntry, MonthlyRevenue
+
+CENT = Decimal('0.01')
+
+
+def month_of(moment):
+    return timezone.localtime(moment).date().replace(day=1)
+
+
+def monthly_amount(amount, billing_cycle):
+    """Recurring revenue a plan price contributes per month"""
+    if billing_cycle == 'yearly':
+        return (Decimal(amount) / 12).quantize(CENT)
+    return Decimal(amount)
+
+
+def record(reference, entry_type, plan_type='', billing_cycle='', amount=0, mrr_change=0,
+           subscriptions_change=0, currency='usd', payment=None, subscription=None, occurred_at=None):
+    """Append a ledger entry and add it to its month's totals.
+
+    Returns False without changing anything if ``reference`` was already recorded.
+    """
+    occurred_at = occurred_at or timezone.now()
+    month = month_of(occurred_at)
+    plan_type = plan_type or ''
+    billing_cycle = billing_cycle or ''
+    try:
+        with transaction.atomic():
+            LedgerEntry.objects.create(
+                reference=reference,
+                entry_type=entry_type,
+                payment=payment,
+                subscription=subscription,
+                plan_type=plan_type,
+                billing_cycle=billing_cycle,
+                currency=currency,
+                amount=amount,
+                mrr_change=mrr_change,
+                subscriptions_change=subscriptions_change,
+                month=month,
+                occurred_at=occurred_at,
+            )
+            totals, _ = MonthlyRevenue.objects.get_or_create(
+                month=month, plan_type=plan_type, billing_cycle=billing_cycle
+            )
+            MonthlyRevenue.objects.filter(id=totals.id).update(
+                revenue=F('revenue') + amount,
+                mrr_change=F('mrr_change') + mrr_change,
+                new_subscriptions=F('new_subscriptions') + max(subscriptions_change, 0),
+                churned_subscriptions=F('churned_subscriptions') + max(-subscriptions_change, 0),
+                updated_at=timezone.now(),
+            )
+    except IntegrityError:
+        return False
+    return True
+
+
+def record_cancellation(subscription):
+    """Put a cancelled subscription's lost recurring revenue on the ledger"""
+    return record(
+        f'cancellation:{subscription.stripe_subscription_id}', 'cancellation',
+        plan_type=subscription.plan_type, billing_cycle=subscription.billing_cycle, currency=subscription.currency,
+        mrr_change=-monthly_amount(subscription.amount, subscription.billing_cycle),
+        subscriptions_change=-1,
+        subscription=subscription,
+    )
+
+
+def total_revenue():
+    return MonthlyRevenue.objects.aggregate(total=Sum('revenue'))['total'] or Decimal('0')
+
+
+def monthly_report(months=12):
+    """Revenue, closing MRR and churn for the last ``months`` months that have ledger activity.
+
+    Returns a list of dicts, oldest first. ``by_plan`` lists that month's revenue per
+    plan type and billing cycle.
+    """
+    rows = MonthlyRevenue.objects.values_list(
+        'month', 'plan_type', 'billing_cycle', 'revenue', 'mrr_change', 'new_subscriptions', 'churned_subscriptions'
+    ).order_by('month')
+
+    report = []
+    mrr = Decimal('0')
+    subscribers = 0
+    for month, plan_type, billing_cycle, revenue, mrr_change, new, churned in rows:
+        if not report or report[-1]['month'] != month:
+            report.append({
+                'month': month,
+                'revenue': Decimal('0'),
+                'mrr': mrr,
+                'new_subscriptions': 0,
+                'churned_subscriptions': 0,
+                'opening_subscriptions': subscribers,
+                'by_plan': [],
+            })
+        current = report[-1]
+        current['revenue'] += revenue
+        current['mrr'] += mrr_change
+        current['new_subscriptions'] += new
+        current['churned_subscriptions'] += churned
+        current['by_plan'].append({'plan_type': plan_type, 'billing_cycle': billing_cycle, 'revenue': revenue})
+        mrr += mrr_change
+        subscribers += new - churned
+
+    for current in report:
+        opening = current['opening_subscriptions']
+        current['churn_rate'] = round(100 * current['churned_subscriptions'] / opening, 1) if opening else None
+    return report[-months:]
@@ -0,0 +1,49 @@
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from payments.fake_stripe import make_server
+
+
+class Command(BaseCommand):
+    help = 'Run a local fake Stripe API (checkout sessions + signed webhooks) for offline load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=12111)
+        parser.add_argument('--webhook-url', default='http://127.0.0.1:8000/payment/webhook/',
+                            help='Where signed webhook events are delivered; empty to disable')
+        parser.add_argument('--webhook-secret', default=settings.STRIPE_WEBHOOK_SECRET,
+                            help='Signing secret, must match STRIPE_WEBHOOK_SECRET of the app')
+        parser.add_argument('--rate', type=float, default=10.0,
+                            help='Maximum webhook events delivered per second')
+        parser.add_argument('--auto-complete', action='store_true',
+                            help='Complete every checkout session as soon as it is created')
+        parser.add_argument('--duplicate-every', type=int, default=0,
+                            help='Deliver every Nth event twice to exercise idempotency')
+
+    def handle(self, *args, **options):
+        server = make_server(
+            options['host'],
+            options['port'],
+            webhook_url=options['webhook_url'] or None,
+            webhook_secret=options['webhook_secret'],
+            rate=options['rate'],
+            auto_complete=options['auto_complete'],
+            duplicate_every=options['duplicate_every'],
+        )
+        emitter = threading.Thread(target=server.stripe.run_emitter, daemon=True)
+        emitter.start()
+
+        self.stdout.write(
+            f'Fake Stripe listening on {server.stripe.base_url} '
+            f'(set STRIPE_API_BASE={server.stripe.base_url}); Ctrl+C to stop.'
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.stripe.stop()
+            server.server_close()
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from payments import webhooks
+
+
+class Command(BaseCommand):
+    help = 'Process queued Stripe webhook events in order, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=webhooks.DEFAULT_BATCH_SIZE,
+                            help='Number of events processed per transaction')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running and process events as they arrive')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds to sleep between passes when looping')
+
+    def handle(self, *args, **options):
+        while True:
+            processed = webhooks.process_pending(options['batch_size'])
+            if processed or not options['loop']:
+                self.stdout.write(f'Processed {processed} webhook events.')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from payments import renewals
+
+
+class Command(BaseCommand):
+    help = 'Send renewal reminders and move lapsed subscriptions to past due, then cancelled'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=renewals.DEFAULT_BATCH_SIZE,
+                            help='Number of subscriptions handled per transaction')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running and sweep subscriptions as their periods end')
+        parser.add_argument('--interval', type=float, default=3600.0,
+                            help='Seconds to sleep between passes when looping')
+
+    def handle(self, *args, **options):
+        while True:
+            swept = renewals.sweep(options['batch_size'])
+            if any(swept.values()) or not options['loop']:
+                self.stdout.write(
+                    f"Reminded {swept['reminded']}, marked {swept['lapsed']} past due or ended, "
+                    f"cancelled {swept['cancelled']} subscriptions."
+                )
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
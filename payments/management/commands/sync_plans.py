@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from payments import catalog
+
+
+class Command(BaseCommand):
+    help = 'Create Stripe Products and Prices for plans that are new or whose amount changed'
+
+    def handle(self, *args, **options):
+        synced = catalog.sync_plans()
+        self.stdout.write(self.style.SUCCESS(f'Synced {synced} plans to Stripe.'))
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:48
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def dedupe_checkout_sessions(apps, schema_editor):
+    """Leave one payment per checkout session so the unique constraint can be added.
+
+    The completed (or else newest) row keeps the session id; the other rows
+    are kept for history with the id cleared.
+    """
+    Payment = apps.get_model('payments', 'Payment')
+    Payment.objects.filter(stripe_checkout_session_id='').update(stripe_checkout_session_id=None)
+    Payment.objects.filter(stripe_payment_intent_id='').update(stripe_payment_intent_id=None)
+
+    duplicated = (
+        Payment.objects.filter(stripe_checkout_session_id__isnull=False)
+        .values('stripe_checkout_session_id')
+        .annotate(rows=Count('id'))
+        .filter(rows__gt=1)
+        .values_list('stripe_checkout_session_id', flat=True)
+    )
+    for session_id in duplicated.iterator():
+        ids = list(
+            Payment.objects.filter(stripe_checkout_session_id=session_id)
+            .order_by('-id')
+            .values_list('id', 'status')
+        )
+        keep = next((pk for pk, status in ids if status == 'completed'), ids[0][0])
+        Payment.objects.filter(id__in=[pk for pk, _ in ids if pk != keep]).update(stripe_checkout_session_id=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0002_webhookevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_checkout_sessions, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['stripe_payment_intent_id'], name='payment_intent_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='payment',
+            constraint=models.UniqueConstraint(condition=models.Q(('stripe_checkout_session_id__isnull', False)), fields=('stripe_checkout_session_id',), name='unique_payment_checkout_session'),
+        ),
+    ]
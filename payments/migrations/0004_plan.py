@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:49
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_payment_stripe_id_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Plan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('plan_type', models.CharField(choices=[('basic', 'Basic Plan'), ('pro', 'Pro Plan'), ('enterprise', 'Enterprise Plan')], max_length=50)),
+                ('billing_cycle', models.CharField(choices=[('monthly', 'Monthly'), ('yearly', 'Yearly')], max_length=20)),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField(blank=True)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('currency', models.CharField(default='usd', max_length=3)),
+                ('is_active', models.BooleanField(default=True)),
+                ('stripe_product_id', models.CharField(blank=True, max_length=255)),
+                ('stripe_price_id', models.CharField(blank=True, max_length=255)),
+                ('synced_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('synced_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['plan_type', 'billing_cycle'],
+                'constraints': [models.UniqueConstraint(fields=('plan_type', 'billing_cycle'), name='unique_plan_cycle')],
+            },
+        ),
+    ]
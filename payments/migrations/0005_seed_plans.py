@@ -0,0 +1,36 @@
+from decimal import Decimal
+
+from django.db import migrations
+
+# The prices previously hardcoded in create_checkout_session
+PLANS = [
+    ('pro', 'monthly', 'Pro Plan', 'Monthly subscription for pro plan', Decimal('99.00')),
+    ('pro', 'yearly', 'Pro Plan', 'Yearly subscription for pro plan', Decimal('594.00')),
+]
+
+
+def seed_plans(apps, schema_editor):
+    Plan = apps.get_model('payments', 'Plan')
+    for plan_type, billing_cycle, name, description, amount in PLANS:
+        Plan.objects.get_or_create(
+            plan_type=plan_type,
+            billing_cycle=billing_cycle,
+            defaults={'name': name, 'description': description, 'amount': amount},
+        )
+
+
+def unseed_plans(apps, schema_editor):
+    Plan = apps.get_model('payments', 'Plan')
+    for plan_type, billing_cycle, *_ in PLANS:
+        Plan.objects.filter(plan_type=plan_type, billing_cycle=billing_cycle).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0004_plan'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_plans, unseed_plans),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:55
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0005_seed_plans'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reference', models.CharField(max_length=255, unique=True)),
+                ('entry_type', models.CharField(choices=[('charge', 'Charge'), ('renewal', 'Renewal'), ('refund', 'Refund'), ('plan_change', 'Plan Change'), ('cancellation', 'Cancellation')], max_length=20)),
+                ('plan_type', models.CharField(blank=True, max_length=50)),
+                ('billing_cycle', models.CharField(blank=True, max_length=20)),
+                ('currency', models.CharField(default='usd', max_length=3)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('mrr_change', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('subscriptions_change', models.SmallIntegerField(default=0)),
+                ('month', models.DateField()),
+                ('occurred_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('payment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='payments.payment')),
+                ('subscription', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='payments.subscription')),
+            ],
+            options={
+                'verbose_name_plural': 'ledger entries',
+                'ordering': ['-occurred_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('plan_type', models.CharField(blank=True, max_length=50)),
+                ('billing_cycle', models.CharField(blank=True, max_length=20)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('mrr_change', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('new_subscriptions', models.PositiveIntegerField(default=0)),
+                ('churned_subscriptions', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['month', 'plan_type', 'billing_cycle'],
+                'constraints': [models.UniqueConstraint(fields=('month', 'plan_type', 'billing_cycle'), name='unique_monthly_revenue')],
+            },
+        ),
+    ]
@@ -0,0 +1,94 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+
+def _month(moment):
+    return timezone.localtime(moment).date().replace(day=1)
+
+
+def _monthly_amount(amount, billing_cycle):
+    if billing_cycle == 'yearly':
+        return (amount / 12).quantize(Decimal('0.01'))
+    return amount
+
+
+def backfill_ledger(apps, schema_editor):
+    """Put existing payments and subscriptions on the ledger and total them per month"""
+    Payment = apps.get_model('payments', 'Payment')
+    Subscription = apps.get_model('payments', 'Subscription')
+    LedgerEntry = apps.get_model('payments', 'LedgerEntry')
+    MonthlyRevenue = apps.get_model('payments', 'MonthlyRevenue')
+
+    entries = []
+    for payment in Payment.objects.filter(status__in=['completed', 'refunded']).iterator():
+        common = {
+            'payment_id': payment.id,
+            'plan_type': payment.plan_type or '',
+            'billing_cycle': payment.billing_cycle or '',
+            'currency': payment.currency,
+        }
+        entries.append(LedgerEntry(
+            reference=f'payment:{payment.id}', entry_type='charge', amount=payment.amount,
+            month=_month(payment.created_at), occurred_at=payment.created_at, **common,
+        ))
+        if payment.status == 'refunded':
+            entries.append(LedgerEntry(
+                reference=f'payment_refund:{payment.id}', entry_type='refund', amount=-payment.amount,
+                month=_month(payment.updated_at), occurred_at=payment.updated_at, **common,
+            ))
+
+    for subscription in Subscription.objects.iterator():
+        common = {
+            'subscription_id': subscription.id,
+            'plan_type': subscription.plan_type,
+            'billing_cycle': subscription.billing_cycle,
+            'currency': subscription.currency,
+        }
+        mrr = _monthly_amount(subscription.amount, subscription.billing_cycle)
+        entries.append(LedgerEntry(
+            reference=f'subscription:{subscription.stripe_subscription_id}', entry_type='charge',
+            mrr_change=mrr, subscriptions_change=1,
+            month=_month(subscription.created_at), occurred_at=subscription.created_at, **common,
+        ))
+        if subscription.status == 'cancelled':
+            entries.append(LedgerEntry(
+                reference=f'cancellation:{subscription.stripe_subscription_id}', entry_type='cancellation',
+                mrr_change=-mrr, subscriptions_change=-1,
+                month=_month(subscription.updated_at), occurred_at=subscription.updated_at, **common,
+            ))
+
+    LedgerEntry.objects.bulk_create(entries, batch_size=500)
+
+    totals = LedgerEntry.objects.values('month', 'plan_type', 'billing_cycle').annotate(
+        revenue=Sum('amount'),
+        mrr=Sum('mrr_change'),
+        new=Count('id', filter=Q(subscriptions_change__gt=0)),
+        churned=Count('id', filter=Q(subscriptions_change__lt=0)),
+    )
+    MonthlyRevenue.objects.bulk_create([
+        MonthlyRevenue(
+            month=row['month'], plan_type=row['plan_type'], billing_cycle=row['billing_cycle'],
+            revenue=row['revenue'], mrr_change=row['mrr'],
+            new_subscriptions=row['new'], churned_subscriptions=row['churned'],
+        )
+        for row in totals
+    ], batch_size=500)
+
+
+def clear_ledger(apps, schema_editor):
+    apps.get_model('payments', 'MonthlyRevenue').objects.all().delete()
+    apps.get_model('payments', 'LedgerEntry').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0006_revenue_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_ledger, clear_ledger),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:24
+
+from django.db import migrations, models
+
+
+def _object_key(event):
+    obj = event.get('data', {}).get('object', {})
+    subscription = obj.get('subscription')
+    if isinstance(subscription, dict):
+        subscription = subscription.get('id')
+    if subscription:
+        return subscription
+    if obj.get('object') == 'subscription':
+        return obj.get('id') or ''
+    return obj.get('customer') or obj.get('id') or ''
+
+
+def backfill_object_keys(apps, schema_editor):
+    """Key events still waiting in the inbox so they are ordered per Stripe object too"""
+    WebhookEvent = apps.get_model('payments', 'WebhookEvent')
+    for event in WebhookEvent.objects.filter(status='pending').iterator():
+        event.object_key = _object_key(event.payload)
+        event.save(update_fields=['object_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0008_subscription_sweeper'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookevent',
+            name='object_key',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='webhookevent',
+            index=models.Index(fields=['object_key', 'status'], name='webhook_event_object'),
+        ),
+        migrations.RunPython(backfill_object_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0009_webhook_event_object_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plan',
+            name='retired_price_id',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0010_plan_retired_price_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscription',
+            name='cancel_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='subscription',
+            name='cancel_retry_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
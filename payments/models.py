@@ -3,6 +3,66 @@ from django.conf import settings
 from django.utils import timezone
 
 
+class Plan(models.Model):
+    """A purchasable plan and the Stripe Product/Price it is sold through"""
+
+    BILLING_CYCLE_CHOICES = [
+        ('monthly', 'Monthly'),
+        ('yearly', 'Yearly'),
+    ]
+
+    # Stripe recurring.interval for each billing cycle
+    STRIPE_INTERVALS = {
+        'monthly': 'month',
+        'yearly': 'year',
+    }
+
+    plan_type = models.CharField(max_length=50, choices=[
+        ('basic', 'Basic Plan'),
+        ('pro', 'Pro Plan'),
+        ('enterprise', 'Enterprise Plan'),
+    ])
+    billing_cycle = models.CharField(max_length=20, choices=BILLING_CYCLE_CHOICES)
+    name = models.CharField(max_length=100)
+    description = models.TextField(blank=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3, default='usd')
+    is_active = models.BooleanField(default=True)
+
+    # Filled in by sync_plans; a Price is immutable, so a changed amount gets a new one
+    stripe_product_id = models.CharField(max_length=255, blank=True)
+    stripe_price_id = models.CharField(max_length=255, blank=True)
+    synced_amount = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    synced_at = models.DateTimeField(blank=True, null=True)
+    # Price replaced by the last sync, deactivated once no cached plan can still refer to it
+    retired_price_id = models.CharField(max_length=255, blank=True)
+
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['plan_type', 'billing_cycle']
+        constraints = [
+            models.UniqueConstraint(fields=['plan_type', 'billing_cycle'], name='unique_plan_cycle'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.billing_cycle})"
+
+    @property
+    def unit_amount(self):
+        """Price in the currency's smallest unit, as Stripe expects"""
+        return int(self.amount * 100)
+
+    @property
+    def stripe_interval(self):
+        return self.STRIPE_INTERVALS[self.billing_cycle]
+
+    @property
+    def needs_sync(self):
+        return not self.stripe_price_id or self.synced_amount != self.amount
+
+
 class Payment(models.Model):
     """Model to track individual payments/transactions"""
 
@@ -42,6 +102,16 @@ class Payment(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['stripe_checkout_session_id'],
+                condition=models.Q(stripe_checkout_session_id__isnull=False),
+                name='unique_payment_checkout_session',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['stripe_payment_intent_id'], name='payment_intent_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.plan_name} - ${self.amount}"
@@ -73,6 +143,12 @@ class Subscription(models.Model):
     current_period_start = models.DateTimeField(blank=True, null=True)
     current_period_end = models.DateTimeField(blank=True, null=True)
     cancel_at_period_end = models.BooleanField(default=False)
+    # Set by sweep_subscriptions once the reminder for the current period has been queued
+    renewal_reminder_sent = models.BooleanField(default=False)
+    # Set by sweep_subscriptions while it cancels the subscription on Stripe, and pushed
+    # back with each failed attempt so a failing cancellation doesn't hold up the rest
+    cancel_attempts = models.PositiveSmallIntegerField(default=0)
+    cancel_retry_at = models.DateTimeField(blank=True, null=True)
 
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     currency = models.CharField(max_length=3, default='usd')
@@ -84,6 +160,11 @@ class Subscription(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'current_period_end'], name='subscription_period_end'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.plan_name} ({self.status})"
 
@@ -96,3 +177,107 @@ class Subscription(models.Model):
         if self.current_period_end:
             return (self.current_period_end - timezone.now()).days
         return None
+
+
+class WebhookEvent(models.Model):
+    """Inbox of verified Stripe webhook events, processed by the process_webhooks worker"""
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processed', 'Processed'),
+        ('failed', 'Failed'),
+    ]
+
+    stripe_event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    # Unix timestamp Stripe assigned to the event; events are processed in this order
+    stripe_created = models.PositiveBigIntegerField(default=0)
+    # Stripe object the event applies to (its subscription where it has one); events for
+    # the same object are processed strictly in order
+    object_key = models.CharField(max_length=255, blank=True)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    received_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['stripe_created', 'id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='webhook_event_due'),
+            models.Index(fields=['object_key', 'status'], name='webhook_event_object'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} ({self.stripe_event_id}) - {self.status}"
+
+
+class LedgerEntry(models.Model):
+    """Append-only record of a change in revenue or recurring revenue.
+
+    Entries are folded into MonthlyRevenue as they are written; reports read
+    the aggregates rather than summing payments.
+    """
+
+    ENTRY_TYPE_CHOICES = [
+        ('charge', 'Charge'),
+        ('renewal', 'Renewal'),
+        ('refund', 'Refund'),
+        ('plan_change', 'Plan Change'),
+        ('cancellation', 'Cancellation'),
+    ]
+
+    # Identifies the transition that produced the entry, so replays are ignored
+    reference = models.CharField(max_length=255, unique=True)
+    entry_type = models.CharField(max_length=20, choices=ENTRY_TYPE_CHOICES)
+    payment = models.ForeignKey(Payment, on_delete=models.SET_NULL, blank=True, null=True, related_name='ledger_entries')
+    subscription = models.ForeignKey(
+        Subscription, on_delete=models.SET_NULL, blank=True, null=True, related_name='ledger_entries'
+    )
+
+    plan_type = models.CharField(max_length=50, blank=True)
+    billing_cycle = models.CharField(max_length=20, blank=True)
+    currency = models.CharField(max_length=3, default='usd')
+
+    # Signed: refunds are negative, as is the recurring revenue lost to a cancellation
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    mrr_change = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    subscriptions_change = models.SmallIntegerField(default=0)
+
+    month = models.DateField()
+    occurred_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-occurred_at']
+        verbose_name_plural = 'ledger entries'
+
+    def __str__(self):
+        return f"{self.get_entry_type_display()} {self.amount} {self.currency} ({self.reference})"
+
+
+class MonthlyRevenue(models.Model):
+    """Per-month, per-plan totals of the ledger, maintained as entries are written"""
+
+    month = models.DateField()
+    plan_type = models.CharField(max_length=50, blank=True)
+    billing_cycle = models.CharField(max_length=20, blank=True)
+
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    mrr_change = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    new_subscriptions = models.PositiveIntegerField(default=0)
+    churned_subscriptions = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['month', 'plan_type', 'billing_cycle']
+        constraints = [
+            models.UniqueConstraint(fields=['month', 'plan_type', 'billing_cycle'], name='unique_monthly_revenue'),
+        ]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.plan_type} {self.billing_cycle}: {self.revenue}"
@@ -0,0 +1,215 @@
+import logging
+from datetime import timedelta
+
+import stripe
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import dateformat, timezone
+
+from crewup import notifications
+
+from . import entitlements, ledger, webhooks
+from .models import Subscription
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+
+# Renewal reminders go out this many days before the period ends
+REMINDER_DAYS = getattr(settings, 'SUBSCRIPTION_REMINDER_DAYS', 3)
+
+# Stripe charges a renewal about an hour after the period ends, and the webhook inbox may
+# retry its event for a while; an unpaid subscription is only marked past due after this
+LAPSE_HOURS = getattr(settings, 'SUBSCRIPTION_LAPSE_HOURS', 24)
+
+# A lapsed subscription stays past due this long before it is cancelled
+GRACE_DAYS = getattr(settings, 'SUBSCRIPTION_GRACE_DAYS', 7)
+
+# Other sweepers skip a subscription this long (seconds) while one cancels it on Stripe
+CANCEL_CLAIM_SECONDS = 10 * 60
+
+
+def _due(status, now=None, **filters):
+    # Range scans on the (status, current_period_end) index, oldest period first. With
+    # ``now``, subscriptions claimed by another sweeper or waiting to retry are skipped.
+    subscriptions = Subscription.objects.select_for_update(skip_locked=True).filter(status=status, **filters)
+    if now is not None:
+        subscriptions = subscriptions.filter(Q(cancel_retry_at__isnull=True) | Q(cancel_retry_at__lte=now))
+    return subscriptions.order_by('current_period_end', 'id')
+
+
+def remind_batch(batch_size=DEFAULT_BATCH_SIZE, now=None):
+    """Queue reminders for active subscriptions whose period ends soon. Returns ``(selected, reminded)``."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        ids = list(
+            _due('active', current_period_end__gt=now,
+                 current_period_end__lte=now + timedelta(days=REMINDER_DAYS), renewal_reminder_sent=False)
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0, 0
+        Subscription.objects.filter(id__in=ids).update(renewal_reminder_sent=True, updated_at=now)
+        notifications.enqueue(notify_period_ending, ids)
+    return len(ids), len(ids)
+
+
+def lapse_batch(batch_size=DEFAULT_BATCH_SIZE, now=None):
+    """Move active subscriptions whose period ended LAPSE_HOURS ago without a renewal to past due.
+
+    Subscriptions set to cancel at period end are cancelled instead. Returns
+    ``(selected, changed)``.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        rows = list(
+            _due('active', now, current_period_end__lte=now - timedelta(hours=LAPSE_HOURS))
+            .values_list('id', 'cancel_at_period_end')[:batch_size]
+        )
+        if not rows:
+            return 0, 0
+        past_due = [pk for pk, cancelling in rows if not cancelling]
+        # Past-due subscriptions keep their features, so only cancellations change entitlements
+        if past_due:
+            Subscription.objects.filter(id__in=past_due).update(status='past_due', updated_at=now)
+            notifications.enqueue(notify_past_due, past_due)
+        ending = _claim([pk for pk, cancelling in rows if cancelling], now)
+    return len(rows), len(past_due) + _cancel(ending, now)
+
+
+def cancel_batch(batch_size=DEFAULT_BATCH_SIZE, now=None):
+    """Cancel subscriptions that stayed past due for the whole grace period. Returns ``(selected, cancelled)``."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        ids = _claim(list(
+            _due('past_due', now, current_period_end__lte=now - timedelta(days=GRACE_DAYS))
+            .values_list('id', flat=True)[:batch_size]
+        ), now)
+    return len(ids), _cancel(ids, now)
+
+
+def _claim(ids, now):
+    # Stripe is called after the selecting transaction commits, so the row locks are gone by then
+    if ids:
+        Subscription.objects.filter(id__in=ids).update(cancel_retry_at=now + timedelta(seconds=CANCEL_CLAIM_SECONDS))
+    return ids
+
+
+def _cancel_on_stripe(subscription):
+    """Stop Stripe billing a subscription. Returns False if it should be retried later."""
+    try:
+        stripe.Subscription.cancel(subscription.stripe_subscription_id)
+    except stripe.error.InvalidRequestError as exc:
+        # Already cancelled or deleted on Stripe, so there is nothing left to stop
+        logger.info('Stripe subscription %s not cancelled: %s', subscription.stripe_subscription_id, exc)
+    except stripe.error.StripeError:
+        logger.warning('Could not cancel Stripe subscription %s (attempt %d)',
+                       subscription.stripe_subscription_id, subscription.cancel_attempts + 1, exc_info=True)
+        return False
+    return True
+
+
+def _cancel(ids, now):
+    """Cancel claimed subscriptions on Stripe, then locally. Returns the number cancelled.
+
+    Cancelling locally only would leave Stripe billing, and a later paid invoice
+    would bring the subscription back. Stripe is called outside any transaction;
+    a subscription it fails to cancel is retried with backoff, so it can't hold
+    up the ones due after it. The customer.subscription.deleted webhook Stripe
+    sends afterwards finds the subscription already cancelled and does nothing.
+    """
+    stopped = []
+    for subscription in Subscription.objects.filter(id__in=ids).only('id', 'stripe_subscription_id', 'cancel_attempts'):
+        if _cancel_on_stripe(subscription):
+            stopped.append(subscription.id)
+        else:
+            attempts = subscription.cancel_attempts + 1
+            Subscription.objects.filter(id=subscription.id).update(
+                cancel_attempts=attempts, cancel_retry_at=now + webhooks.backoff(attempts),
+            )
+    if not stopped:
+        return 0
+
+    with transaction.atomic():
+        # The webhook worker may have cancelled some of them meanwhile
+        subscriptions = list(Subscription.objects.select_for_update().filter(id__in=stopped).exclude(status='cancelled'))
+        if not subscriptions:
+            return 0
+        ids = [subscription.id for subscription in subscriptions]
+        Subscription.objects.filter(id__in=ids).update(
+            status='cancelled', cancel_at_period_end=False, cancel_attempts=0, cancel_retry_at=None, updated_at=now,
+        )
+        for subscription in subscriptions:
+            ledger.record_cancellation(subscription)
+        entitlements.invalidate([subscription.user_id for subscription in subscriptions])
+        notifications.enqueue(notify_cancelled, ids)
+    return len(ids)
+
+
+def _sweep(batch, batch_size, now):
+    # Keep going while batches come back full; rows that failed are skipped until their retry
+    total = 0
+    while True:
+        selected, changed = batch(batch_size, now)
+        total += changed
+        if selected < batch_size:
+            return total
+
+
+def sweep(batch_size=DEFAULT_BATCH_SIZE, now=None):
+    """Run every sweep to completion, one short transaction per batch.
+
+    Returns ``{'reminded': n, 'lapsed': n, 'cancelled': n}``.
+    """
+    now = now or timezone.now()
+    return {
+        'reminded': _sweep(remind_batch, batch_size, now),
+        'lapsed': _sweep(lapse_batch, batch_size, now),
+        'cancelled': _sweep(cancel_batch, batch_size, now),
+    }
+
+
+# Notifications
+
+def _send(subscription_ids, subject, body):
+    subscriptions = (
+        Subscription.objects.filter(id__in=subscription_ids)
+        .exclude(user__email='')
+        .values_list('user__email', 'plan_name', 'current_period_end')
+        .iterator(chunk_size=DEFAULT_BATCH_SIZE)
+    )
+    return notifications.send_emails(
+        (subject, body.format(plan=plan_name, date=dateformat.format(timezone.localtime(period_end), 'F j, Y')), [email])
+        for email, plan_name, period_end in subscriptions
+    )
+
+
+def notify_period_ending(subscription_ids):
+    """E-mail subscribers whose billing period ends within the reminder window"""
+    return _send(
+        subscription_ids,
+        'Your CrewUp billing period ends soon',
+        'The current billing period of your {plan} subscription ends on {date}.\n\n'
+        'Unless you have cancelled, it renews automatically; make sure your payment details are up to date.',
+    )
+
+
+def notify_past_due(subscription_ids):
+    """E-mail subscribers whose renewal hasn't been paid"""
+    return _send(
+        subscription_ids,
+        'Your CrewUp subscription payment is overdue',
+        f'We could not confirm the renewal of your {{plan}} subscription, which ended on {{date}}.\n\n'
+        f'Update your payment details within {GRACE_DAYS} days to keep your Pro features.',
+    )
+
+
+def notify_cancelled(subscription_ids):
+    """E-mail subscribers whose subscription has been cancelled"""
+    return _send(
+        subscription_ids,
+        'Your CrewUp subscription has ended',
+        'Your {plan} subscription ended on {date}.\n\n'
+        'You can subscribe again at any time from the Pricing page.',
+    )
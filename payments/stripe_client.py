@@ -0,0 +1,138 @@
+import hashlib
+import re
+import time
+from urllib.parse import urlsplit
+
+import requests
+import stripe
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = [25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+_ENDPOINTS_KEY = 'stripe:latency:endpoints'
+_NUMERIC_SEGMENT = re.compile(r'\d')
+
+
+def endpoint_name(method, url):
+    """``GET /v1/checkout/sessions/:id`` style label, with object ids collapsed"""
+    segments = [
+        ':id' if _NUMERIC_SEGMENT.search(segment) and not re.fullmatch(r'v\d+', segment) else segment
+        for segment in urlsplit(url).path.split('/')
+    ]
+    return f"{method.upper()} {'/'.join(segments)}"
+
+
+def _key(endpoint, field):
+    # Endpoint labels contain spaces, which some cache backends reject in keys
+    digest = hashlib.md5(endpoint.encode()).hexdigest()
+    return f'stripe:latency:{digest}:{field}'
+
+
+def _incr(key, delta=1):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key, delta)
+
+
+def record_latency(endpoint, elapsed_ms, failed=False):
+    """Add one request to the endpoint's histogram in the default cache, which must be shared (payments.W001)"""
+    if cache.add(_key(endpoint, 'known'), True, None):
+        endpoints = cache.get(_ENDPOINTS_KEY) or []
+        if endpoint not in endpoints:
+            cache.set(_ENDPOINTS_KEY, endpoints + [endpoint], None)
+
+    bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if elapsed_ms <= bound), len(LATENCY_BUCKETS_MS))
+    _incr(_key(endpoint, f'bucket{bucket}'))
+    _incr(_key(endpoint, 'count'))
+    _incr(_key(endpoint, 'total_ms'), int(elapsed_ms))
+    if failed:
+        _incr(_key(endpoint, 'errors'))
+
+
+def _percentile(buckets, count, fraction):
+    # Upper bound of the bucket the percentile falls in; None for the open-ended bucket
+    threshold = count * fraction
+    seen = 0
+    for bound, hits in zip(LATENCY_BUCKETS_MS + [None], buckets):
+        seen += hits
+        if seen >= threshold:
+            return bound
+    return None
+
+
+def latency_report():
+    """Per-endpoint request counts, error counts and approximate percentiles, slowest first"""
+    endpoints = cache.get(_ENDPOINTS_KEY) or []
+    fields = ['count', 'total_ms', 'errors'] + [f'bucket{i}' for i in range(len(LATENCY_BUCKETS_MS) + 1)]
+    values = cache.get_many([_key(endpoint, field) for endpoint in endpoints for field in fields])
+
+    report = []
+    for endpoint in endpoints:
+        row = {field: values.get(_key(endpoint, field), 0) for field in fields}
+        count = row['count']
+        if not count:
+            continue
+        buckets = [row[f'bucket{i}'] for i in range(len(LATENCY_BUCKETS_MS) + 1)]
+        report.append({
+            'endpoint': endpoint,
+            'count': count,
+            'errors': row['errors'],
+            'avg_ms': round(row['total_ms'] / count),
+            'p50_ms': _percentile(buckets, count, 0.50),
+            'p95_ms': _percentile(buckets, count, 0.95),
+            'p99_ms': _percentile(buckets, count, 0.99),
+            'buckets': buckets,
+        })
+    return sorted(report, key=lambda row: row['avg_ms'], reverse=True)
+
+
+def reset_latency():
+    endpoints = cache.get(_ENDPOINTS_KEY) or []
+    fields = ['known', 'count', 'total_ms', 'errors'] + [f'bucket{i}' for i in range(len(LATENCY_BUCKETS_MS) + 1)]
+    cache.delete_many([_key(endpoint, field) for endpoint in endpoints for field in fields] + [_ENDPOINTS_KEY])
+
+
+class InstrumentedRequestsClient(stripe.RequestsClient):
+    """Stripe HTTP client that times every attempt per endpoint"""
+
+    def request(self, method, url, headers, post_data=None):
+        started = time.monotonic()
+        failed = True
+        try:
+            response = super().request(method, url, headers, post_data)
+            failed = response[1] >= 500
+            return response
+        finally:
+            record_latency(endpoint_name(method, url), (time.monotonic() - started) * 1000, failed)
+
+
+def build_http_client():
+    """Stripe HTTP client on one pooled keep-alive session with bounded timeouts"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=settings.STRIPE_HTTP_POOL_SIZE,
+        pool_maxsize=settings.STRIPE_HTTP_POOL_SIZE,
+        # Retries are left to the Stripe client, which adds jitter and idempotency keys
+        max_retries=0,
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return InstrumentedRequestsClient(
+        timeout=(settings.STRIPE_CONNECT_TIMEOUT, settings.STRIPE_READ_TIMEOUT),
+        session=session,
+    )
+
+
+def configure():
+    """Point the global stripe module at our settings and HTTP client"""
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    if settings.STRIPE_API_BASE:
+        stripe.api_base = settings.STRIPE_API_BASE
+    # Retried with exponential backoff and jitter; POSTs get an idempotency key so retries are safe
+    stripe.max_network_retries = settings.STRIPE_MAX_NETWORK_RETRIES
+    stripe.default_http_client = build_http_client()
@@ -0,0 +1,13 @@
+from django import template
+
+from payments import entitlements
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def has_feature(context, feature):
+    """``{% has_feature 'exports' as can_export %}`` for the current user"""
+    request = context.get('request')
+    user = request.user if request is not None else context.get('user')
+    return user is not None and entitlements.has_feature(user, feature)
@@ -1,3 +1,607 @@
-from django.test import TestCase
+import json
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+import stripe
+
+from django.contrib.auth.models import AnonymousUser
+from django.core import mail
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from authentication.models import CustomUser
+from .fake_stripe import decode_form, make_server, sign_payload
+from .models import LedgerEntry, MonthlyRevenue, Payment, Plan, Subscription, WebhookEvent
+from . import catalog, checks, entitlements, ledger, renewals, stripe_client, webhooks
+
+WEBHOOK_SECRET = 'whsec_test'
+
+
+def signed_headers(payload, secret=WEBHOOK_SECRET):
+    return {'HTTP_STRIPE_SIGNATURE': sign_payload(payload, secret)}
+
+
+def checkout_completed_event(event_id, session_id, created=1):
+    return {
+        'id': event_id,
+        'object': 'event',
+        'type': 'checkout.session.completed',
+        'created': created,
+        'data': {'object': {
+            'id': session_id, 'object': 'checkout.session', 'mode': 'subscription',
+            'payment_intent': None, 'subscription': 'sub_123', 'customer': 'cus_123',
+        }},
+    }
+
+
+class FakeStripeMixin:
+    """Points the Stripe client at an in-process fake Stripe server"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.server = make_server(port=0, webhook_secret=WEBHOOK_SECRET)
+        threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        for name, value in (('api_base', self.server.stripe.base_url), ('api_key', 'sk_test_fake')):
+            self.addCleanup(setattr, stripe, name, getattr(stripe, name))
+            setattr(stripe, name, value)
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+class StripeWebhookTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='brand', email='brand@example.com', user_type='brand')
+        self.payment = Payment.objects.create(
+            user=self.user, stripe_checkout_session_id='cs_123', amount=Decimal('99.00'),
+            plan_name='Pro Plan', plan_type='pro', billing_cycle='monthly', is_subscription=True,
+        )
+        self.url = reverse('payments:stripe_webhook')
+
+    def post_event(self, event):
+        payload = json.dumps(event)
+        return self.client.post(self.url, payload, content_type='application/json', **signed_headers(payload))
+
+    def test_endpoint_only_stores_event(self):
+        response = self.post_event(checkout_completed_event('evt_1', 'cs_123'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(WebhookEvent.objects.get().status, 'pending')
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'pending')
+
+    def test_bad_signature_is_rejected(self):
+        payload = json.dumps(checkout_completed_event('evt_1', 'cs_123'))
+        response = self.client.post(self.url, payload, content_type='application/json',
+                                    **signed_headers(payload, secret='whsec_other'))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_duplicate_delivery_is_processed_once(self):
+        event = checkout_completed_event('evt_1', 'cs_123')
+        self.post_event(event)
+        self.post_event(event)
+
+        self.assertEqual(webhooks.process_pending(), 1)
+        self.assertEqual(WebhookEvent.objects.get().status, 'processed')
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'completed')
+        self.assertEqual(Subscription.objects.get(user=self.user).stripe_subscription_id, 'sub_123')
+
+    def test_failing_event_is_retried_with_backoff(self):
+        WebhookEvent.objects.create(
+            stripe_event_id='evt_bad', event_type='invoice.payment_succeeded',
+            payload={'data': {'object': {'subscription': 'sub_123', 'lines': {'data': []}}}},
+        )
+
+        webhooks.process_pending()
+
+        event = WebhookEvent.objects.get()
+        self.assertEqual(event.status, 'pending')
+        self.assertEqual(event.attempts, 1)
+        self.assertIn('IndexError', event.last_error)
+        self.assertGreater(event.next_attempt_at, timezone.now())
+        # Not due yet, so a second pass leaves it alone
+        self.assertEqual(webhooks.process_pending(), 0)
+
+    def test_later_events_wait_for_a_retried_event_on_the_same_object(self):
+        WebhookEvent.objects.create(
+            stripe_event_id='evt_bad', event_type='invoice.payment_succeeded', stripe_created=1, object_key='sub_123',
+            payload={'data': {'object': {'subscription': 'sub_123', 'lines': {'data': []}}}},
+        )
+        self.post_event(checkout_completed_event('evt_2', 'cs_123', created=2))
+
+        self.assertEqual(webhooks.process_pending(), 1)
+        self.assertEqual(WebhookEvent.objects.get(stripe_event_id='evt_2').object_key, 'sub_123')
+        self.assertEqual(WebhookEvent.objects.get(stripe_event_id='evt_2').attempts, 0)
+
+        # Once the earlier event gives up, the rest of the object's events run
+        WebhookEvent.objects.filter(stripe_event_id='evt_bad').update(status='failed')
+        self.assertEqual(webhooks.process_pending(), 1)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'completed')
+
+    def test_event_fails_permanently_after_max_attempts(self):
+        event = WebhookEvent.objects.create(
+            stripe_event_id='evt_bad', event_type='customer.subscription.deleted',
+            payload={'data': {'object': {}}}, attempts=webhooks.MAX_ATTEMPTS - 1,
+        )
+
+        webhooks.process_pending()
+
+        event.refresh_from_db()
+        self.assertEqual(event.status, 'failed')
+
+    def test_checkout_session_id_is_unique(self):
+        Payment.objects.create(user=self.user, amount=Decimal('99.00'))
+        Payment.objects.create(user=self.user, amount=Decimal('99.00'))
+
+        with self.assertRaises(IntegrityError):
+            Payment.objects.create(user=self.user, stripe_checkout_session_id='cs_123', amount=Decimal('99.00'))
+
+
+class RevenueLedgerTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='brand', email='brand@example.com', user_type='brand')
+
+    def complete_checkout(self, session_id, amount, billing_cycle, subscription_id):
+        Payment.objects.create(
+            user=self.user, stripe_checkout_session_id=session_id, amount=Decimal(amount),
+            plan_name='Pro Plan', plan_type='pro', billing_cycle=billing_cycle, is_subscription=True,
+        )
+        session = {'id': session_id, 'mode': 'subscription', 'subscription': subscription_id, 'customer': 'cus_1'}
+        webhooks.handle_checkout_session_completed(session)
+        # Replays must not be counted twice
+        webhooks.handle_checkout_session_completed(session)
+
+    def test_checkout_adds_revenue_and_mrr(self):
+        self.complete_checkout('cs_1', '594.00', 'yearly', 'sub_1')
+
+        month = ledger.monthly_report()[-1]
+        self.assertEqual(month['revenue'], Decimal('594.00'))
+        self.assertEqual(month['mrr'], Decimal('49.50'))
+        self.assertEqual(month['new_subscriptions'], 1)
+        self.assertEqual(month['by_plan'], [{'plan_type': 'pro', 'billing_cycle': 'yearly', 'revenue': Decimal('594.00')}])
+        self.assertEqual(ledger.total_revenue(), Decimal('594.00'))
+
+    def test_plan_change_moves_mrr_without_new_subscriber(self):
+        self.complete_checkout('cs_1', '99.00', 'monthly', 'sub_1')
+        self.complete_checkout('cs_2', '594.00', 'yearly', 'sub_2')
+
+        month = ledger.monthly_report()[-1]
+        self.assertEqual(month['revenue'], Decimal('693.00'))
+        self.assertEqual(month['mrr'], Decimal('49.50'))
+        self.assertEqual(month['new_subscriptions'], 1)
+
+    def test_cancellation_is_churn(self):
+        self.complete_checkout('cs_1', '99.00', 'monthly', 'sub_1')
+        MonthlyRevenue.objects.update(month=date(2020, 1, 1))
+
+        webhooks.handle_subscription_deleted({'id': 'sub_1'})
+        webhooks.handle_subscription_deleted({'id': 'sub_1'})
+
+        previous, current = ledger.monthly_report()
+        self.assertEqual(previous['mrr'], Decimal('99.00'))
+        self.assertEqual(current['mrr'], Decimal('0.00'))
+        self.assertEqual(current['churned_subscriptions'], 1)
+        self.assertEqual(current['churn_rate'], 100.0)
+
+    def test_partial_refunds_are_subtracted_once(self):
+        self.complete_checkout('cs_1', '99.00', 'monthly', 'sub_1')
+        Payment.objects.update(stripe_payment_intent_id='pi_1')
+        charge = {'id': 'ch_1', 'payment_intent': 'pi_1', 'amount_refunded': 2000, 'refunded': False}
+
+        webhooks.handle_charge_refunded(charge)
+        webhooks.handle_charge_refunded(charge)
+        webhooks.handle_charge_refunded(dict(charge, amount_refunded=9900, refunded=True))
+
+        self.assertEqual(ledger.total_revenue(), Decimal('0.00'))
+        self.assertEqual(Payment.objects.get().status, 'refunded')
+
+    def test_renewal_invoice_adds_revenue(self):
+        self.complete_checkout('cs_1', '99.00', 'monthly', 'sub_1')
+        invoice = {
+            'id': 'in_2', 'subscription': 'sub_1', 'billing_reason': 'subscription_cycle', 'amount_paid': 9900,
+            'currency': 'usd', 'lines': {'data': [{'period': {'start': 1700000000, 'end': 1702592000}}]},
+        }
+
+        webhooks.handle_invoice_payment_succeeded(invoice)
+        webhooks.handle_invoice_payment_succeeded(invoice)
+        webhooks.handle_invoice_payment_succeeded(dict(invoice, id='in_1', billing_reason='subscription_create'))
+
+        self.assertEqual(ledger.total_revenue(), Decimal('198.00'))
+        self.assertEqual(LedgerEntry.objects.filter(entry_type='renewal').count(), 1)
+
+
+@override_settings(NOTIFICATIONS_ASYNC=False, EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class SubscriptionSweepTests(FakeStripeMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+
+    def subscribe(self, name, days_left, status='active', **fields):
+        user = CustomUser.objects.create_user(username=name, email=f'{name}@example.com', user_type='brand')
+        self.server.stripe.create_subscription(f'sub_{name}')
+        return Subscription.objects.create(
+            user=user, stripe_subscription_id=f'sub_{name}', plan_name='Pro Plan', plan_type='pro',
+            amount=Decimal('99.00'), billing_cycle='monthly', status=status,
+            current_period_end=self.now + timedelta(days=days_left), **fields,
+        )
+
+    def sweep(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return renewals.sweep(batch_size=2, now=self.now)
+
+    def test_sweep_transitions_and_notifies(self):
+        expiring = [self.subscribe(f'soon{i}', 2) for i in range(3)]
+        later = self.subscribe('later', 20)
+        lapsed = self.subscribe('lapsed', -2)
+        ending = self.subscribe('ending', -2, cancel_at_period_end=True)
+        renewing = self.subscribe('renewing', -0.1)
+        overdue = self.subscribe('overdue', -renewals.GRACE_DAYS - 1, status='past_due')
+
+        self.assertEqual(self.sweep(), {'reminded': 3, 'lapsed': 2, 'cancelled': 1})
+
+        statuses = dict(Subscription.objects.values_list('id', 'status'))
+        self.assertEqual(statuses[later.id], 'active')
+        # Just ended: Stripe hasn't had the chance to charge the renewal yet
+        self.assertEqual(statuses[renewing.id], 'active')
+        self.assertEqual(statuses[lapsed.id], 'past_due')
+        self.assertEqual(statuses[ending.id], 'cancelled')
+        self.assertEqual(statuses[overdue.id], 'cancelled')
+        self.assertTrue(all(Subscription.objects.get(id=sub.id).renewal_reminder_sent for sub in expiring))
+        self.assertEqual(LedgerEntry.objects.filter(entry_type='cancellation').count(), 2)
+        self.assertEqual(
+            sorted(message.subject for message in mail.outbox),
+            ['Your CrewUp billing period ends soon'] * 3
+            + ['Your CrewUp subscription has ended'] * 2
+            + ['Your CrewUp subscription payment is overdue'],
+        )
+
+    def test_cancellation_stops_stripe_billing(self):
+        overdue = self.subscribe('overdue', -renewals.GRACE_DAYS - 1, status='past_due')
+
+        self.sweep()
+
+        self.assertEqual(self.server.stripe.subscriptions['sub_overdue']['status'], 'canceled')
+        # Stripe's follow-up webhook and any late invoice leave the cancellation alone
+        webhooks.handle_subscription_deleted({'id': 'sub_overdue'})
+        webhooks.handle_invoice_payment_succeeded({
+            'id': 'in_late', 'subscription': 'sub_overdue', 'amount_paid': 9900,
+            'lines': {'data': [{'period': {'start': int(self.now.timestamp()), 'end': int(self.now.timestamp()) + 86400}}]},
+        })
+        overdue.refresh_from_db()
+        self.assertEqual(overdue.status, 'cancelled')
+        self.assertEqual(LedgerEntry.objects.filter(entry_type='cancellation').count(), 1)
+
+    def test_stripe_failure_is_retried_with_backoff(self):
+        overdue = [self.subscribe(f'overdue{i}', -renewals.GRACE_DAYS - 1, status='past_due') for i in range(3)]
+        self.addCleanup(setattr, stripe, 'max_network_retries', stripe.max_network_retries)
+        self.addCleanup(setattr, stripe, 'api_base', stripe.api_base)
+        stripe.max_network_retries = 0
+        stripe.api_base = 'http://127.0.0.1:9'
+
+        with self.assertLogs('payments.renewals', 'WARNING'):
+            self.assertEqual(self.sweep()['cancelled'], 0)
+
+        # A failed batch doesn't stop the sweep from reaching the subscriptions after it
+        self.assertEqual(
+            list(Subscription.objects.values_list('status', 'cancel_attempts').distinct()), [('past_due', 1)],
+        )
+        self.assertFalse(LedgerEntry.objects.exists())
+
+        stripe.api_base = self.server.stripe.base_url
+        self.assertEqual(self.sweep()['cancelled'], 0)
+
+        self.now += webhooks.backoff(1)
+        self.assertEqual(self.sweep()['cancelled'], 3)
+        self.assertEqual(
+            [Subscription.objects.get(id=sub.id).status for sub in overdue], ['cancelled'] * 3,
+        )
+
+    def test_reminders_are_sent_once_per_period(self):
+        self.subscribe('soon', 2)
+
+        self.sweep()
+        self.assertEqual(self.sweep(), {'reminded': 0, 'lapsed': 0, 'cancelled': 0})
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_paid_renewal_resets_reminder(self):
+        subscription = self.subscribe('soon', 2)
+        self.sweep()
+
+        webhooks.handle_invoice_payment_succeeded({
+            'id': 'in_1', 'subscription': subscription.stripe_subscription_id, 'amount_paid': 9900,
+            'lines': {'data': [{'period': {'start': int(self.now.timestamp()), 'end': int(self.now.timestamp()) + 86400}}]},
+        })
+
+        subscription.refresh_from_db()
+        self.assertEqual(subscription.status, 'active')
+        self.assertFalse(subscription.renewal_reminder_sent)
+
+
+class EntitlementTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username='brand', email='brand@example.com', user_type='brand')
+        self.subscription = Subscription.objects.create(
+            user=self.user, stripe_subscription_id='sub_1', plan_name='Pro Plan', plan_type='pro',
+            amount=Decimal('99.00'), billing_cycle='monthly',
+        )
+
+    def fresh_user(self):
+        # A new object per "request", as the auth middleware would load
+        return CustomUser.objects.get(id=self.user.id)
+
+    def test_lookup_is_cached_and_memoized(self):
+        user = self.fresh_user()
+        with self.assertNumQueries(1):
+            self.assertTrue(entitlements.has_feature(user, entitlements.EXPORTS))
+            self.assertTrue(entitlements.has_feature(user, entitlements.BULK_OFFERS))
+
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertEqual(entitlements.get_entitlements(user)['plan'], 'pro')
+
+    def test_cancellation_webhook_revokes_features(self):
+        self.assertTrue(entitlements.has_feature(self.fresh_user(), entitlements.EXPORTS))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            webhooks.handle_subscription_deleted({'id': 'sub_1'})
+
+        self.assertFalse(entitlements.has_feature(self.fresh_user(), entitlements.EXPORTS))
+
+    def test_past_due_keeps_features(self):
+        self.subscription.status = 'past_due'
+        self.subscription.save()
+
+        self.assertTrue(entitlements.has_feature(self.fresh_user(), entitlements.EXPORTS))
+
+    def test_template_tag(self):
+        template = Template("{% load entitlements %}{% has_feature 'exports' as ok %}{{ ok }}")
+        request = RequestFactory().get('/')
+        request.user = self.fresh_user()
+
+        self.assertEqual(template.render(Context({'request': request})), 'True')
+        request.user = AnonymousUser()
+        self.assertEqual(template.render(Context({'request': request})), 'False')
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+class FakeStripeTests(FakeStripeMixin, TestCase):
+
+    def test_decode_form(self):
+        self.assertEqual(
+            decode_form('mode=payment&line_items[0][quantity]=1&line_items[0][price]=price_1&metadata[user_id]=7'),
+            {'mode': 'payment', 'line_items': [{'quantity': '1', 'price': 'price_1'}], 'metadata': {'user_id': '7'}},
+        )
+
+    def test_checkout_session_round_trip(self):
+        session = stripe.checkout.Session.create(
+            mode='subscription', success_url='http://app/success/?session_id={CHECKOUT_SESSION_ID}',
+            line_items=[{'price': 'price_1', 'quantity': 1}], metadata={'user_id': 1},
+        )
+
+        self.assertTrue(session.id.startswith('cs_test_'))
+        self.assertEqual(stripe.checkout.Session.retrieve(session.id).status, 'open')
+
+        self.server.stripe.complete_session(session.id)
+        retrieved = stripe.checkout.Session.retrieve(session.id)
+        self.assertEqual(retrieved.status, 'complete')
+        self.assertTrue(retrieved.subscription.startswith('sub_test_'))
+
+    def test_emitted_webhooks_are_accepted_by_the_app(self):
+        session = self.server.stripe.create_session({'mode': 'payment'})
+        self.server.stripe.complete_session(session['id'])
+        event = self.server.stripe.events.get_nowait()
+
+        payload = json.dumps(event)
+        response = self.client.post(reverse('payments:stripe_webhook'), payload,
+                                    content_type='application/json', **signed_headers(payload))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(WebhookEvent.objects.get().event_type, 'checkout.session.completed')
+
+
+class PlanCatalogTests(FakeStripeMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.plan = Plan.objects.get(plan_type='pro', billing_cycle='monthly')
+
+    def test_sync_creates_recurring_price_once(self):
+        self.assertEqual(catalog.sync_plans(), 2)
+        self.assertEqual(catalog.sync_plans(), 0)
+
+        self.plan.refresh_from_db()
+        price = self.server.stripe.prices[self.plan.stripe_price_id]
+        self.assertEqual(price['unit_amount'], 9900)
+        self.assertEqual(price['recurring'], {'interval': 'month'})
+
+    def test_changed_amount_gets_new_price(self):
+        catalog.sync_plan(self.plan)
+        old_price_id = self.plan.stripe_price_id
+
+        self.plan.amount = Decimal('129.00')
+        self.plan.save()
+        catalog.sync_plan(self.plan)
+
+        self.assertNotEqual(self.plan.stripe_price_id, old_price_id)
+        # Workers may still have the plan cached with the old Price, so it stays usable for now
+        self.assertTrue(self.server.stripe.prices[old_price_id]['active'])
+        self.assertEqual(catalog.retire_prices(), 0)
+
+        Plan.objects.filter(id=self.plan.id).update(synced_at=timezone.now() - timedelta(seconds=catalog.PLAN_CACHE_TIMEOUT))
+        self.assertEqual(catalog.sync_plans(), 1)
+        self.assertFalse(self.server.stripe.prices[old_price_id]['active'])
+        self.assertTrue(self.server.stripe.prices[self.plan.stripe_price_id]['active'])
+
+    def test_get_plan_is_cached(self):
+        catalog.get_plan('pro', 'monthly')
+        catalog.get_plan('gold', 'monthly')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(catalog.get_plan('pro', 'monthly'), self.plan)
+            self.assertIsNone(catalog.get_plan('gold', 'monthly'))
+
+    def test_admin_save_drops_the_cached_plan(self):
+        admin_user = CustomUser.objects.create_superuser(username='admin', email='admin@example.com', password='pass12345')
+        self.client.force_login(admin_user)
+        catalog.get_plan('pro', 'monthly')
+
+        self.client.post(reverse('admin:payments_plan_change', args=[self.plan.id]), {
+            'plan_type': 'pro', 'billing_cycle': 'monthly', 'name': self.plan.name, 'description': '',
+            'amount': '129.00', 'currency': 'usd', 'is_active': 'on',
+            'created_at_0': '2026-01-01', 'created_at_1': '00:00:00',
+        })
+
+        self.assertEqual(catalog.get_plan('pro', 'monthly').amount, Decimal('129.00'))
+
+    def test_checkout_references_price_by_id(self):
+        catalog.sync_plans()
+        user = CustomUser.objects.create_user(username='brand', email='brand@example.com', user_type='brand')
+        self.client.force_login(user)
+
+        response = self.client.get(reverse('payments:create_checkout_session', args=['pro', 'yearly']))
+
+        session_id = response.json()['session_id']
+        session = self.server.stripe.sessions[session_id]
+        plan = Plan.objects.get(plan_type='pro', billing_cycle='yearly')
+        self.assertEqual(session['line_items'], [{'price': plan.stripe_price_id, 'quantity': '1'}])
+        self.assertEqual(Payment.objects.get(stripe_checkout_session_id=session_id).amount, Decimal('594.00'))
+
+    def test_checkout_resyncs_a_repriced_plan(self):
+        catalog.sync_plans()
+        Plan.objects.filter(id=self.plan.id).update(amount=Decimal('129.00'))
+        catalog.invalidate(self.plan)
+        user = CustomUser.objects.create_user(username='brand', email='brand@example.com', user_type='brand')
+        self.client.force_login(user)
+
+        response = self.client.get(reverse('payments:create_checkout_session', args=['pro', 'monthly']))
+
+        session = self.server.stripe.sessions[response.json()['session_id']]
+        price = self.server.stripe.prices[session['line_items'][0]['price']]
+        self.assertEqual(price['unit_amount'], 12900)
+        self.assertEqual(Payment.objects.get(stripe_checkout_session_id=session['id']).amount, Decimal('129.00'))
+
+
+class PaymentStatusTests(FakeStripeMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = CustomUser.objects.create_user(username='brand', email='brand@example.com', user_type='brand')
+        self.client.force_login(self.user)
+        self.session = self.server.stripe.create_session({'mode': 'subscription'})
+        self.payment = Payment.objects.create(
+            user=self.user, stripe_checkout_session_id=self.session['id'], amount=Decimal('99.00'),
+            plan_name='Pro Plan', plan_type='pro', billing_cycle='monthly', is_subscription=True,
+        )
+
+    def test_success_page_reads_local_state_only(self):
+        self.server.stripe.complete_session(self.session['id'])
+
+        response = self.client.get(reverse('payments:payment_success'), {'session_id': self.session['id']})
+
+        self.assertContains(response, 'Confirming Your Payment')
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'pending')
+
+    def test_status_falls_back_to_stripe_at_most_once_per_interval(self):
+        url = reverse('payments:payment_status')
+
+        self.assertEqual(self.client.get(url, {'session_id': self.session['id']}).json()['status'], 'pending')
+
+        # Paid now, but the last check was too recent to ask Stripe again
+        self.server.stripe.complete_session(self.session['id'])
+        self.assertEqual(self.client.get(url, {'session_id': self.session['id']}).json()['status'], 'pending')
+
+        cache.clear()
+        self.assertEqual(self.client.get(url, {'session_id': self.session['id']}).json()['status'], 'completed')
+        self.assertTrue(Subscription.objects.filter(user=self.user, status='active').exists())
+
+    def test_status_needs_a_session_id(self):
+        # Older payments have no session id; they must not be matched by a missing parameter
+        Payment.objects.create(user=self.user, amount=Decimal('99.00'), plan_name='Pro Plan', plan_type='pro')
+
+        response = self.client.get(reverse('payments:payment_status'))
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_failed_refresh_leaves_the_payment_for_the_webhook(self):
+        self.server.stripe.complete_session(self.session['id'])
+        # The subscription id is already taken, so activating it fails after the payment update
+        other = CustomUser.objects.create_user(username='other', user_type='brand')
+        Subscription.objects.create(
+            user=other, stripe_subscription_id=self.server.stripe.sessions[self.session['id']]['subscription'],
+            plan_name='Pro Plan', plan_type='pro', amount=Decimal('99.00'), billing_cycle='monthly',
+        )
+
+        with self.assertLogs('payments.views', 'ERROR'):
+            response = self.client.get(reverse('payments:payment_status'), {'session_id': self.session['id']})
+
+        self.assertEqual(response.json()['status'], 'pending')
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'pending')
+        self.assertFalse(LedgerEntry.objects.exists())
+
+    def test_status_of_another_users_payment_is_hidden(self):
+        self.client.force_login(CustomUser.objects.create_user(username='other', user_type='brand'))
+
+        response = self.client.get(reverse('payments:payment_status'), {'session_id': self.session['id']})
+
+        self.assertEqual(response.status_code, 404)
+
+
+class StripeClientTests(FakeStripeMixin, TestCase):
+
+    def test_endpoint_name_collapses_object_ids(self):
+        self.assertEqual(
+            stripe_client.endpoint_name('get', 'https://api.stripe.com/v1/checkout/sessions/cs_test_a1b2?expand=x'),
+            'GET /v1/checkout/sessions/:id',
+        )
+        self.assertEqual(stripe_client.endpoint_name('post', 'https://api.stripe.com/v1/prices'), 'POST /v1/prices')
+
+    def test_calls_are_recorded_per_endpoint(self):
+        self.assertIsInstance(stripe.default_http_client, stripe_client.InstrumentedRequestsClient)
+        session = self.server.stripe.create_session({'mode': 'subscription'})
+
+        stripe.checkout.Session.retrieve(session['id'])
+        stripe.checkout.Session.retrieve(session['id'])
+        with self.assertRaises(stripe.error.InvalidRequestError):
+            stripe.checkout.Session.retrieve('cs_test_missing1')
+
+        report = {row['endpoint']: row for row in stripe_client.latency_report()}
+        row = report['GET /v1/checkout/sessions/:id']
+        self.assertEqual(row['count'], 3)
+        self.assertEqual(sum(row['buckets']), 3)
+        self.assertEqual(row['errors'], 0)
+
+    def test_admin_can_view_and_reset_latency(self):
+        stripe_client.record_latency('GET /v1/prices/:id', 120)
+        admin = CustomUser.objects.create_user(username='admin', user_type='admin')
+        self.client.force_login(admin)
+        url = reverse('adminPanel:stripe_latency')
+
+        self.assertContains(self.client.get(url), 'GET /v1/prices/:id')
+
+        self.client.post(url)
+        self.assertEqual(stripe_client.latency_report(), [])
+
+    def test_process_local_latency_cache_is_flagged(self):
+        self.assertEqual([warning.id for warning in checks.check_stripe_latency_cache(None)], ['payments.W001'])
+
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+            self.assertEqual(checks.check_stripe_latency_cache(None), [])
+
+    def test_latency_page_is_admin_only(self):
+        self.client.force_login(CustomUser.objects.create_user(username='brand', user_type='brand'))
+
+        response = self.client.get(reverse('adminPanel:stripe_latency'))
+
+        self.assertEqual(response.status_code, 302)
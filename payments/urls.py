@@ -9,6 +9,7 @@ urlpatterns = [
 
     # Payment results
     path('success/', views.payment_success, name='payment_success'),
+    path('status/', views.payment_status, name='payment_status'),
     path('cancel/', views.payment_cancel, name='payment_cancel'),
 
     # Stripe webhooks
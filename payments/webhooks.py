@@ -0,0 +1,275 @@
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef, Q, Sum
+from django.utils import timezone
+
+from . import entitlements, ledger
+from .models import Payment, Subscription, WebhookEvent
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+MAX_ATTEMPTS = 8
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 6 * 60 * 60
+
+
+def object_key(event):
+    """The Stripe object whose state an event changes: its subscription, else the object itself"""
+    obj = event.get('data', {}).get('object', {})
+    subscription = obj.get('subscription')
+    if isinstance(subscription, dict):
+        subscription = subscription.get('id')
+    if subscription:
+        return subscription
+    if obj.get('object') == 'subscription':
+        return obj.get('id') or ''
+    return obj.get('customer') or obj.get('id') or ''
+
+
+def record_event(event):
+    """Persist a verified Stripe event in the inbox. Returns False for a duplicate delivery."""
+    try:
+        with transaction.atomic():
+            WebhookEvent.objects.create(
+                stripe_event_id=event['id'],
+                event_type=event['type'],
+                payload=event,
+                stripe_created=event.get('created') or 0,
+                object_key=object_key(event),
+            )
+    except IntegrityError:
+        return False
+    return True
+
+
+# Handlers: each must be safe to run more than once for the same event
+
+def handle_checkout_session_completed(session):
+    """Mark the checkout's payment completed and activate its subscription"""
+    payment = Payment.objects.filter(stripe_checkout_session_id=session['id']).first()
+    if payment is None:
+        logger.warning('No payment found for checkout session %s', session['id'])
+        return
+
+    completed = Payment.objects.filter(id=payment.id, status='pending').update(
+        status='completed',
+        stripe_payment_intent_id=session.get('payment_intent'),
+        updated_at=timezone.now(),
+    )
+
+    subscription = None
+    replaces_active = False
+    starts_subscription = session.get('mode') == 'subscription' and bool(session.get('subscription'))
+    if starts_subscription:
+        previous = Subscription.objects.filter(user_id=payment.user_id).first()
+        now = timezone.now()
+        subscription, _ = Subscription.objects.update_or_create(
+            user_id=payment.user_id,
+            defaults={
+                'stripe_subscription_id': session['subscription'],
+                'stripe_customer_id': session.get('customer'),
+                'plan_name': payment.plan_name,
+                'plan_type': payment.plan_type,
+                'status': 'active',
+                'amount': payment.amount,
+                'currency': payment.currency,
+                'billing_cycle': payment.billing_cycle,
+                'current_period_start': now,
+                'current_period_end': now + timedelta(days=30 if payment.billing_cycle == 'monthly' else 365),
+                'renewal_reminder_sent': False,
+            },
+        )
+        replaces_active = (
+            previous is not None and previous.status != 'cancelled'
+            and previous.stripe_subscription_id != session['subscription']
+        )
+
+    if starts_subscription:
+        entitlements.invalidate([payment.user_id])
+
+    if completed:
+        # Switching plans moves the old plan's recurring revenue rather than adding a subscriber
+        if replaces_active:
+            ledger.record(
+                f'plan_change:{previous.stripe_subscription_id}', 'plan_change',
+                plan_type=previous.plan_type, billing_cycle=previous.billing_cycle, currency=previous.currency,
+                mrr_change=-ledger.monthly_amount(previous.amount, previous.billing_cycle),
+                subscription=subscription,
+            )
+        ledger.record(
+            f'checkout:{session["id"]}', 'charge',
+            plan_type=payment.plan_type, billing_cycle=payment.billing_cycle, currency=payment.currency,
+            amount=payment.amount,
+            mrr_change=ledger.monthly_amount(payment.amount, payment.billing_cycle) if starts_subscription else 0,
+            subscriptions_change=1 if starts_subscription and not replaces_active else 0,
+            payment=payment, subscription=subscription,
+        )
+
+
+def _invalidate_entitlements(stripe_subscription_id):
+    entitlements.invalidate(
+        Subscription.objects.filter(stripe_subscription_id=stripe_subscription_id).values_list('user_id', flat=True)
+    )
+
+
+def _from_timestamp(value):
+    return datetime.fromtimestamp(value, tz=dt_timezone.utc)
+
+
+def handle_invoice_payment_succeeded(invoice):
+    """Extend the subscription period covered by a paid invoice"""
+    if not invoice.get('subscription'):
+        return
+    period = invoice['lines']['data'][0]['period']
+    _invalidate_entitlements(invoice['subscription'])
+    # A cancelled subscription stays cancelled; its cancellation is already on the ledger
+    renewed = Subscription.objects.filter(stripe_subscription_id=invoice['subscription']).exclude(status='cancelled').update(
+        status='active',
+        current_period_start=_from_timestamp(period['start']),
+        current_period_end=_from_timestamp(period['end']),
+        renewal_reminder_sent=False,
+        updated_at=timezone.now(),
+    )
+    if not renewed:
+        logger.warning('Invoice %s paid for missing or cancelled subscription %s', invoice.get('id'), invoice['subscription'])
+
+    # The first invoice is already on the ledger as the checkout charge
+    if invoice.get('billing_reason') == 'subscription_create':
+        return
+    subscription = Subscription.objects.filter(stripe_subscription_id=invoice['subscription']).first()
+    if subscription is not None:
+        ledger.record(
+            f'invoice:{invoice["id"]}', 'renewal',
+            plan_type=subscription.plan_type, billing_cycle=subscription.billing_cycle,
+            currency=invoice.get('currency') or subscription.currency,
+            amount=Decimal(invoice.get('amount_paid') or 0) / 100,
+            subscription=subscription,
+        )
+
+
+def handle_invoice_payment_failed(invoice):
+    """Flag a subscription whose renewal payment failed"""
+    if not invoice.get('subscription'):
+        return
+    _invalidate_entitlements(invoice['subscription'])
+    Subscription.objects.filter(stripe_subscription_id=invoice['subscription']).exclude(status='cancelled').update(
+        status='past_due', updated_at=timezone.now()
+    )
+
+
+def handle_subscription_deleted(subscription_data):
+    """Mark a subscription cancelled on Stripe as cancelled locally"""
+    subscription = Subscription.objects.filter(stripe_subscription_id=subscription_data['id']).first()
+    if subscription is None:
+        return
+    cancelled = Subscription.objects.filter(id=subscription.id).exclude(status='cancelled').update(
+        status='cancelled', cancel_at_period_end=False, updated_at=timezone.now()
+    )
+    if cancelled:
+        entitlements.invalidate([subscription.user_id])
+        ledger.record_cancellation(subscription)
+
+
+def handle_charge_refunded(charge):
+    """Mark a refunded payment and take the refund off the ledger"""
+    if not charge.get('payment_intent'):
+        return
+    payment = Payment.objects.filter(stripe_payment_intent_id=charge['payment_intent']).first()
+    if payment is None:
+        return
+    if charge.get('refunded'):
+        Payment.objects.filter(id=payment.id, status='completed').update(status='refunded', updated_at=timezone.now())
+
+    # amount_refunded is cumulative over partial refunds; only the difference is new
+    refunded = Decimal(charge.get('amount_refunded') or 0) / 100
+    already = -(payment.ledger_entries.filter(entry_type='refund').aggregate(total=Sum('amount'))['total'] or 0)
+    if refunded > already:
+        ledger.record(
+            f'refund:{charge["id"]}:{charge["amount_refunded"]}', 'refund',
+            plan_type=payment.plan_type, billing_cycle=payment.billing_cycle, currency=payment.currency,
+            amount=already - refunded,
+            payment=payment,
+        )
+
+
+HANDLERS = {
+    'checkout.session.completed': handle_checkout_session_completed,
+    'invoice.payment_succeeded': handle_invoice_payment_succeeded,
+    'invoice.payment_failed': handle_invoice_payment_failed,
+    'customer.subscription.deleted': handle_subscription_deleted,
+    'charge.refunded': handle_charge_refunded,
+}
+
+
+# Worker
+
+def backoff(attempts):
+    """Delay before the next attempt after ``attempts`` failures"""
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS))
+
+
+def process_event(event):
+    """Run the handler for one inbox event, recording success or scheduling a retry"""
+    handler = HANDLERS.get(event.event_type)
+    try:
+        with transaction.atomic():
+            if handler is not None:
+                handler(event.payload['data']['object'])
+            else:
+                logger.debug('Ignoring unhandled Stripe event type %s', event.event_type)
+    except Exception as exc:
+        event.attempts += 1
+        event.last_error = f'{type(exc).__name__}: {exc}'
+        if event.attempts >= MAX_ATTEMPTS:
+            event.status = 'failed'
+            logger.exception('Stripe event %s failed permanently after %d attempts', event.stripe_event_id, event.attempts)
+        else:
+            event.next_attempt_at = timezone.now() + backoff(event.attempts)
+            logger.warning('Stripe event %s failed (attempt %d), retrying at %s',
+                           event.stripe_event_id, event.attempts, event.next_attempt_at, exc_info=True)
+        event.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+        return False
+
+    event.status = 'processed'
+    event.attempts += 1
+    event.processed_at = timezone.now()
+    event.save(update_fields=['status', 'attempts', 'processed_at'])
+    return True
+
+
+def process_batch(batch_size=DEFAULT_BATCH_SIZE):
+    """Process the next batch of due events in Stripe order. Returns the number attempted.
+
+    An event waits while an earlier event for the same Stripe object is still
+    pending, so a retried checkout is never overtaken by its first renewal.
+    """
+    earlier = WebhookEvent.objects.filter(
+        Q(stripe_created__lt=OuterRef('stripe_created')) | Q(stripe_created=OuterRef('stripe_created'), id__lt=OuterRef('id')),
+        status='pending',
+        object_key=OuterRef('object_key'),
+    ).exclude(object_key='')
+    with transaction.atomic():
+        # skip_locked lets several workers share the inbox without double-processing
+        events = list(
+            WebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=timezone.now())
+            .exclude(Exists(earlier))
+            .order_by('stripe_created', 'id')[:batch_size]
+        )
+        for event in events:
+            process_event(event)
+    return len(events)
+
+
+def process_pending(batch_size=DEFAULT_BATCH_SIZE):
+    """Process every due event, one transaction per batch. Returns the number attempted."""
+    total = 0
+    while True:
+        attempted = process_batch(batch_size)
+        total += attempted
+        if attempted < batch_size:
+            return total